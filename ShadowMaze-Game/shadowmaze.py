@@ -16,7 +16,7 @@
 #
 
 
-import os, sys, pygame, random, time, threading
+import os, sys, pygame, random, time, heapq
 from pygame import mixer
 from collections import deque
 
@@ -89,11 +89,13 @@ def draw_text(surface, text, pos, font_size=30, color=COLOR_TEXT):
     render = font.render(text, True, color)
     surface.blit(render, pos)
 
-# Collision detection
-def check_collision(new_rect, collidable_rects):
-    for rect in collidable_rects:
-        if new_rect.colliderect(rect):
-            return True
+# Collision detection - every wall rect lies inside its own cell, so only the cells under new_rect are checked
+def check_collision(new_rect):
+    for x in range(new_rect.left // cell_size, (new_rect.right - 1) // cell_size + 1):
+        for y in range(new_rect.top // cell_size, (new_rect.bottom - 1) // cell_size + 1):
+            for wall in cell_walls.get((x, y), ()):
+                if new_rect.colliderect(wall['rect']):
+                    return True
     return False
 
 # Maze generation - Prim's alg
@@ -143,6 +145,7 @@ def build_fixed_walls(maze, maze_width, maze_height, cell_size):
             cell = maze[y][x]
             if cell['N']:
                 wall = {}
+                wall['cell'] = (x, y)
                 wall['id'] = f"{x}_{y}_N"
                 wall['start'] = (cell_x, cell_y)
                 wall['end'] = (cell_x + cell_size, cell_y)
@@ -150,6 +153,7 @@ def build_fixed_walls(maze, maze_width, maze_height, cell_size):
                 walls.append(wall)
             if cell['W']:
                 wall = {}
+                wall['cell'] = (x, y)
                 wall['id'] = f"{x}_{y}_W"
                 wall['start'] = (cell_x, cell_y)
                 wall['end'] = (cell_x, cell_y + cell_size)
@@ -157,6 +161,7 @@ def build_fixed_walls(maze, maze_width, maze_height, cell_size):
                 walls.append(wall)
             if cell['E']:
                 wall = {}
+                wall['cell'] = (x, y)
                 wall['id'] = f"{x}_{y}_E"
                 wall['start'] = (cell_x + cell_size, cell_y)
                 wall['end'] = (cell_x + cell_size, cell_y + cell_size)
@@ -164,6 +169,7 @@ def build_fixed_walls(maze, maze_width, maze_height, cell_size):
                 walls.append(wall)
             if cell['S']:
                 wall = {}
+                wall['cell'] = (x, y)
                 wall['id'] = f"{x}_{y}_S"
                 wall['start'] = (cell_x, cell_y + cell_size)
                 wall['end'] = (cell_x + cell_size, cell_y + cell_size)
@@ -173,32 +179,103 @@ def build_fixed_walls(maze, maze_width, maze_height, cell_size):
 
 # Fixed walls variables
 fixed_walls = []
+walls_by_id = {}
+cell_walls = {}
 wall_visual_state = {}
-wall_lock = threading.Lock()
-
-# Wall visuals
-def update_wall_visual_states():
+dirty_walls = set()
+maze_surface = None
+# Measured cost of a full redraw and of repainting one changed wall (seconds), the cheaper one is used
+full_repaint_time = None
+wall_repaint_time = None
+
+# Wall visuals - driven by the game time from playing_loop, so nothing changes while paused
+WALL_TICK_MS = 1000
+WALL_HIDDEN_MS = 5000
+wall_events = []   # heap of (game time to show again, tick it was hidden on, wall ids)
+next_wall_tick = WALL_TICK_MS
+
+def reset_wall_events():
+    global next_wall_tick
+    wall_events.clear()
+    next_wall_tick = WALL_TICK_MS
+
+def update_wall_visual_states(game_time):
+    global next_wall_tick
     while True:
-        time.sleep(1)
-        with wall_lock:
+        # Walls due at the same time as a tick are shown first, so they can be hidden again by it
+        if wall_events and wall_events[0][0] <= min(game_time, next_wall_tick):
+            _, _, wall_ids = heapq.heappop(wall_events)
+            for wall_id in wall_ids:
+                set_wall_visible(wall_id)
+        elif next_wall_tick <= game_time:
+            hidden = []
             for wall in fixed_walls:
                 wall_id = wall['id']
                 if wall_visual_state.get(wall_id, True):
                     if random.random() < 0.5:
                         wall_visual_state[wall_id] = False
+                        dirty_walls.add(wall_id)
+                        hidden.append(wall_id)
                         if dev_mode:
                             print(f"{time.strftime('%H:%M:%S')} - Wall {wall_id} set to invisible")
-                        threading.Timer(5.0, set_wall_visible, args=(wall_id,)).start()
+            if hidden:
+                heapq.heappush(wall_events, (next_wall_tick + WALL_HIDDEN_MS, next_wall_tick, hidden))
+            next_wall_tick += WALL_TICK_MS
+        else:
+            break
 
 def set_wall_visible(wall_id):
-    with wall_lock:
-        wall_visual_state[wall_id] = True
+    wall_visual_state[wall_id] = True
+    dirty_walls.add(wall_id)
     if dev_mode:
         print(f"{time.strftime('%H:%M:%S')} - Wall {wall_id} set to visible")
 
-# Threadning
-wall_update_thread = threading.Thread(target=update_wall_visual_states, daemon=True)
-wall_update_thread.start()
+# Maze layer - walls are drawn once, then only the changed ones are repainted
+def wall_region(wall):
+    (x1, y1), (x2, y2) = wall['start'], wall['end']
+    return pygame.Rect(min(x1, x2) - WALL_THICKNESS, min(y1, y2) - WALL_THICKNESS,
+                       abs(x2 - x1) + 2 * WALL_THICKNESS, abs(y2 - y1) + 2 * WALL_THICKNESS)
+
+def nearby_walls(wall):
+    x, y = wall['cell']
+    for nx in range(x - 1, x + 2):
+        for ny in range(y - 1, y + 2):
+            yield from cell_walls.get((nx, ny), ())
+
+def build_maze_surface():
+    global maze_surface, full_repaint_time
+    if maze_surface is None:
+        maze_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    started = time.perf_counter()
+    maze_surface.fill(COLOR_BG)
+    dirty_walls.clear()
+    for wall in fixed_walls:
+        if wall_visual_state.get(wall['id'], True):
+            pygame.draw.line(maze_surface, COLOR_WALL, wall['start'], wall['end'], WALL_THICKNESS)
+    full_repaint_time = time.perf_counter() - started
+
+def repaint_dirty_walls():
+    global wall_repaint_time
+    if not dirty_walls:
+        return
+    changed = [walls_by_id[wall_id] for wall_id in dirty_walls if wall_id in walls_by_id]
+    dirty_walls.clear()
+    if wall_repaint_time is not None and len(changed) * wall_repaint_time > full_repaint_time:
+        build_maze_surface()
+        return
+    started = time.perf_counter()
+    # Clear the area around every changed wall, then draw back each visible wall crossing any of them once
+    redraw = {}
+    for wall in changed:
+        maze_surface.fill(COLOR_BG, wall['region'])
+        for other in wall['overlaps']:
+            redraw[other['id']] = other
+    for other in redraw.values():
+        if wall_visual_state.get(other['id'], True):
+            pygame.draw.line(maze_surface, COLOR_WALL, other['start'], other['end'], WALL_THICKNESS)
+    if changed:
+        per_wall = (time.perf_counter() - started) / len(changed)
+        wall_repaint_time = per_wall if wall_repaint_time is None else 0.8 * wall_repaint_time + 0.2 * per_wall
 
 # Maze-solving alg...
 def find_path(start, goal, maze):
@@ -282,9 +359,22 @@ def start_game():
     paused_time_accumulated = 0
     time_limit_seconds = TIME_LIMITS[selected_time_limit]
     fixed_walls[:] = build_fixed_walls(maze, maze_width, maze_height, cell_size)
-    with wall_lock:
-        for wall in fixed_walls:
-            wall_visual_state[wall['id']] = True
+    # Wall lookup by id and by cell, used for repainting and collisions
+    walls_by_id.clear()
+    cell_walls.clear()
+    for wall in fixed_walls:
+        walls_by_id[wall['id']] = wall
+        cell_walls.setdefault(wall['cell'], []).append(wall)
+    # Walls whose pixels can fall inside each wall's repaint area
+    for wall in fixed_walls:
+        wall['region'] = wall_region(wall)
+    for wall in fixed_walls:
+        wall['overlaps'] = [other for other in nearby_walls(wall) if wall['region'].colliderect(other['region'])]
+    wall_visual_state.clear()
+    for wall in fixed_walls:
+        wall_visual_state[wall['id']] = True
+    reset_wall_events()
+    build_maze_surface()
     change_state("playing")
 
 def restart_game():
@@ -449,14 +539,13 @@ def playing_loop():
         if keys[pygame.K_DOWN] or keys[pygame.K_s]:
             dy += player_speed
 
-        collidable_rects = [wall['rect'] for wall in fixed_walls]
         p_size = player_size
         player_rect = pygame.Rect(int(player_x - p_size//2), int(player_y - p_size//2), p_size, p_size)
         new_rect = player_rect.move(dx, 0)
-        if not check_collision(new_rect, collidable_rects):
+        if not check_collision(new_rect):
             player_x += dx
         new_rect = player_rect.move(0, dy)
-        if not check_collision(new_rect, collidable_rects):
+        if not check_collision(new_rect):
             player_y += dy
 
         current_cell = (int(player_x // cell_size), int(player_y // cell_size))
@@ -467,11 +556,9 @@ def playing_loop():
             change_state("game_over")
             break
 
-        screen.fill(COLOR_BG)
-        with wall_lock:
-            for wall in fixed_walls:
-                if wall_visual_state.get(wall['id'], True):
-                    pygame.draw.line(screen, COLOR_WALL, wall['start'], wall['end'], WALL_THICKNESS)
+        update_wall_visual_states(effective_time)
+        repaint_dirty_walls()
+        screen.blit(maze_surface, (0, 0))
         finish_rect = pygame.Rect(finish_cell[0]*cell_size + cell_size//4,
                                   finish_cell[1]*cell_size + cell_size//4,
                                   cell_size//2, cell_size//2)
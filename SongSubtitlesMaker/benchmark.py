@@ -0,0 +1,113 @@
+#
+# Reproducible benchmark for makevideo.py: synthetic audio, generated background and a fixed subtitle file,
+# so the render half needs no Whisper model download.
+#
+# Usage: python benchmark.py --duration 60 --size 1920x1080 --backends moviepy,ffmpeg --karaoke --output bench.json
+# Add --model tiny to also time the transcription half (downloads that model once).
+#
+# Every case runs makevideo.py in its own process with --stats, so timings and peak memory don't mix.
+#
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import makevideo
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LINE = "the quick brown fox jumps over the lazy dog while the band keeps playing"
+
+def make_audio(path, duration):
+    """Two tone chord with a pulse, ffmpeg can't tell it from music."""
+    expression = "0.3*sin(2*PI*220*t)+0.2*sin(2*PI*330*t)*(0.5+0.5*sin(2*PI*2*t))"
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"aevalsrc={expression}:s=44100:d={duration}",
+                    "-c:a", "libmp3lame", path], check=True)
+
+def make_background(path, duration, size, fps):
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i",
+                    f"testsrc2=size={size[0]}x{size[1]}:rate={fps}:duration={duration}",
+                    "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", path], check=True)
+
+def make_subtitles(path, duration, lines):
+    """Evenly spaced lines with evenly spaced word times."""
+    segments = []
+    step = duration / lines
+    words = LINE.split()
+    for i in range(lines):
+        start, end = i * step + 0.2, (i + 1) * step - 0.2
+        word_step = (end - start) / len(words)
+        segments.append({"start": start, "end": end, "text": LINE,
+                         "words": [{"word": " " + word, "start": start + j * word_step}
+                                   for j, word in enumerate(words)]})
+    makevideo.write_srt(segments, filename=path, karaoke=True)
+
+def run_case(work_dir, name, options, stdin=None):
+    """Run makevideo.py once and return its stats report."""
+    stats_path = os.path.join(work_dir, name + ".json")
+    cmd = [sys.executable, os.path.join(SCRIPT_DIR, "makevideo.py"), "--stats", stats_path] + options
+    result = subprocess.run(cmd, cwd=work_dir, input=stdin, capture_output=True, text=True)
+    if result.returncode != 0 or not os.path.exists(stats_path):
+        print(result.stdout[-2000:], result.stderr[-2000:])
+        raise RuntimeError(f"Case {name} failed")
+    with open(stats_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark makevideo.py stages on generated media")
+    parser.add_argument("--duration", default=30, type=float, help="Song length in seconds")
+    parser.add_argument("--size", default="1920x1080", help="Background size")
+    parser.add_argument("--fps", default=24, type=int, help="Frame rate")
+    parser.add_argument("--lines", default=12, type=int, help="Number of subtitle lines")
+    parser.add_argument("--backends", default="moviepy,ffmpeg", help="Render backends to compare")
+    parser.add_argument("--karaoke", action="store_true", help="Also run every backend with word highlighting")
+    parser.add_argument("--preview", action="store_true", help="Also run every backend in preview mode")
+    parser.add_argument("--model", default=None, help="Also time transcription with this Whisper model")
+    parser.add_argument("--font", default=os.path.join(SCRIPT_DIR, "mainfont.ttf"), help="Font")
+    parser.add_argument("--output", default=None, help="Write results as JSON here")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    results = {"duration": args.duration, "size": args.size, "fps": args.fps, "lines": args.lines, "cases": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        print("INFO: Generating audio, background and subtitles...")
+        make_audio(os.path.join(work_dir, "song.mp3"), args.duration)
+        make_background(os.path.join(work_dir, "background.mp4"), args.duration, (width, height), args.fps)
+        make_subtitles(os.path.join(work_dir, "subtitles.txt"), args.duration, args.lines)
+        common = ["--audio", "song.mp3", "--background", "background.mp4", "--font", os.path.abspath(args.font),
+                  "--font_size", str(round(40 * height / 720)), "--fps", str(args.fps)]
+
+        cases = []
+        for backend in args.backends.split(","):
+            cases.append((backend, ["--backend", backend]))
+            if args.karaoke:
+                cases.append((backend + "_karaoke", ["--backend", backend, "--karaoke"]))
+            if args.preview:
+                cases.append((backend + "_preview", ["--backend", backend, "--preview"]))
+        for name, options in cases:
+            print(f"INFO: Running {name}...")
+            report = run_case(work_dir, name, common + options + ["--usetext", "--text", "subtitles.txt",
+                                                                  "--output", name + ".mp4"])
+            report["realtime"] = round(args.duration / report["wall_s"], 2)
+            results["cases"][name] = report
+            print(f"INFO: {name}: {report['wall_s']}s ({report['realtime']}x realtime) {report['stages']}")
+
+        if args.model:
+            print(f"INFO: Running transcription with {args.model}...")
+            report = run_case(work_dir, "transcribe", common + ["--model", args.model, "--server", "", "--no_cache",
+                                                                "--text", "transcribed.txt", "--backend", "ffmpeg",
+                                                                "--output", "transcribe.mp4"], stdin="\n")
+            results["cases"]["transcribe"] = report
+            print(f"INFO: transcribe: {report['stages']}")
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"INFO: Results written to {args.output}")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
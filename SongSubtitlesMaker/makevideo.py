@@ -5,47 +5,152 @@
 #
 # This script makes subtitles using audio/video only.
 #
-# You can change the whisper model to something else or if you want, you can make or use your own STT model.
+# You can change the whisper model with --model or if you want, you can make or use your own STT model.
+# Run whisperserver.py to keep the model loaded between songs.
+# --backend ffmpeg renders the video in one ffmpeg run (needs ffmpeg built with libass).
 #
 # You can edit this code because the subtitles are pretty basic.
 #
-# Requirements: pip install moviepy openai-whisper
+# Requirements: pip install moviepy openai-whisper (numpy and torch come with whisper)
 # Requirements if problems with whisper (helped for me): pip install --upgrade openai-whisper
 #
 # You need to have the font you want to use
 #
 
 import argparse
+import bisect
+import hashlib
+import json
+import multiprocessing
 import os
+import queue
+import re
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
 import textwrap
+import threading
+import time
+import numpy as np
+import torch
 import whisper
 from moviepy import *
-import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+from whisperserver import DEFAULT_ADDRESS, parse_address, read_message, send_message
+
+try:
+    import resource
+except ImportError:
+    resource = None   # Windows, peak memory isn't reported there
+
+MODEL_NAME = "large-v3"   # base (less than 300 MBs) / medium (more than 1.5 GBs) / large-v3 (more than 2.8 GBs)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "songsubtitles")
+
+WORD_TAG = re.compile(r"<(\d+:\d+:\d+,\d+)>")
+
+class StageTimer:
+    """Wall-clock seconds per pipeline stage for --stats.
+
+    "decode" (reading background frames) and "composite" (drawing subtitles)
+    happen inside "export", the rest of "export" is mostly encoding.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
 
-def write_srt(segments, filename="text.txt"):
-    """Write segments to SRT file."""
+    def timed(self, name, fn):
+        """Wrap fn so every call is added to stage name."""
+        def call(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return call
+
+    def report(self, **extra):
+        report = {"wall_s": round(time.perf_counter() - self.started, 3),
+                  "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+                  "peak_rss_mb": peak_rss_mb()}
+        report.update(extra)
+        return report
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of finished child processes (ffmpeg) in MB."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {"self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+            "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1)}
+
+def write_stats(report, path):
+    """Write --stats report as JSON, "-" prints it."""
+    text = json.dumps(report, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"INFO: Stats written to {path}")
+
+def srt_time(t):
+    """Format seconds as SRT timestamp."""
+    hours = int(t // 3600)
+    minutes = int((t % 3600) // 60)
+    seconds = t % 60
+    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}".replace(".", ",")
+
+def parse_time(t):
+    """Parse SRT timestamp to seconds."""
+    h, m, s_ms = t.split(":")
+    s, ms = s_ms.split(",")
+    return int(h)*3600 + int(m)*60 + float(s) + float(ms)/1000
+
+def tag_words(words, width=40):
+    """Wrapped text with a <start time> tag before every word (karaoke format)."""
+    tokens = [(part, word["start"]) for word in words for part in word["word"].split()]
+    # Break only between words, so every line holds whole tagged tokens
+    lines = textwrap.wrap(" ".join(token for token, _ in tokens), width=width, break_long_words=False,
+                          break_on_hyphens=False)
+    tagged = []
+    for line in lines:
+        count = len(line.split())
+        tagged.append(" ".join(f"<{srt_time(start)}>{token}" for token, start in tokens[:count]))
+        tokens = tokens[count:]
+    return "\n".join(tagged)
+
+def write_srt(segments, filename="text.txt", karaoke=False):
+    """Write segments to SRT file, with karaoke word times are written as tags in the text."""
     with open(filename, "w", encoding="utf-8") as f:
         for i, seg in enumerate(segments, start=1):
-            # Format start time
-            start = seg["start"]
-            hours = int(start // 3600)
-            minutes = int((start % 3600) // 60)
-            seconds = start % 60
-            start_str = f"{hours:02d}:{minutes:02d}:{seconds:06.3f}".replace(".", ",")
-            # Format end time
-            end = seg["end"]
-            hours = int(end // 3600)
-            minutes = int((end % 3600) // 60)
-            seconds = end % 60
-            end_str = f"{hours:02d}:{minutes:02d}:{seconds:06.3f}".replace(".", ",")
+            start_str = srt_time(seg["start"])
+            end_str = srt_time(seg["end"])
             # Wrap text for readability
-            wrapped_text = "\n".join(textwrap.wrap(seg["text"].strip(), width=40))
+            if karaoke and seg.get("words"):
+                wrapped_text = tag_words(seg["words"])
+            else:
+                wrapped_text = "\n".join(textwrap.wrap(seg["text"].strip(), width=40, break_on_hyphens=not karaoke))
             f.write(f"{i}\n")
             f.write(f"{start_str} --> {end_str}\n")
             f.write(f"{wrapped_text}\n\n")
 
 def read_srt(filename="text.txt"):
-    """Read SRT file and return list of segments."""
+    """Read SRT file and return list of segments (with "words" if the text has word tags)."""
     segments = []
     with open(filename, "r", encoding="utf-8") as f:
         content = f.read().strip()
@@ -61,99 +166,591 @@ def read_srt(filename="text.txt"):
                 start_str, arrow, end_str = time_line.split()
             except Exception:
                 continue
-            def parse_time(t):
-                h, m, s_ms = t.split(":")
-                s, ms = s_ms.split(",")
-                return int(h)*3600 + int(m)*60 + float(s) + float(ms)/1000
             start = parse_time(start_str.strip())
             end = parse_time(end_str.strip())
             text = "\n".join(lines[2:]).strip()
-            segments.append({"start": start, "end": end, "text": text})
+            segment = {"start": start, "end": end, "text": WORD_TAG.sub("", text)}
+            if WORD_TAG.search(text):
+                # Untagged words (added while editing) are highlighted with the word before them
+                words = []
+                word_start = start
+                for token in text.split():
+                    match = WORD_TAG.match(token)
+                    if match:
+                        word_start = parse_time(match.group(1))
+                        token = token[match.end():]
+                    if token:
+                        words.append({"word": token, "start": word_start})
+                segment["words"] = words
+            segments.append(segment)
     return segments
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Create video with subtitles"
-    )
-    parser.add_argument("--audio", required=True, help="Audio file")
-    parser.add_argument("--background", required=True, help="Video file")
-    parser.add_argument("--output", default="output.mp4", help="Output file")
-    parser.add_argument("--font", default="mainfont.ttf", help="Font")
-    parser.add_argument("--font_size", default=40, type=int, help="Font size")
-    parser.add_argument("--font_color", default="white", type=str, help="Font color")
-    parser.add_argument("--opacity", default=0.5, type=float, help="Background opacity")
-    parser.add_argument("--min_duration", default=0.3, type=float, 
-                      help="Minimum subtitle duration in seconds")
-    parser.add_argument("--merge_threshold", default=0, type=float,
-                      help="Merge segments closer than this threshold")
-    parser.add_argument("--speech_threshold", default=0.1, type=float,
-                      help="Minimum speech probability to keep segment")
-    parser.add_argument("--fps", default=24, type=int, help="Set video framerate")
-    parser.add_argument("--usetext", action="store_true", help="Skips AI STT and makes video using text.txt data")
-    args = parser.parse_args()
+def file_hash(path):
+    """Return sha256 of file content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    # Load and process audio/video
-    print("INFO: Loading background video and audio...")
-    background = VideoFileClip(args.background)
-    audio_clip = AudioFileClip(args.audio)
+def transcript_key(audio_hash, duration, model_name, options):
+    """Cache key for raw Whisper segments of an audio file."""
+    data = json.dumps({"audio": audio_hash, "duration": round(duration, 3),
+                       "model": model_name, "options": options}, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def load_transcript(cache_dir, key):
+    """Return cached segments or None."""
+    path = os.path.join(cache_dir, key + ".json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["segments"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_transcript(cache_dir, key, segments):
+    """Store segments atomically so an interrupted run never leaves a broken entry."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key + ".json")
+    with open(path + ".part", "w", encoding="utf-8") as f:
+        json.dump({"segments": segments}, f, default=float)
+    os.replace(path + ".part", path)
+
+def transcribe_remote(address, model_name, audio, options):
+    """Send audio to whisperserver.py, return segments or None if the server isn't running."""
+    try:
+        sock = socket.create_connection(parse_address(address), timeout=2)
+    except OSError:
+        return None
+    with sock:
+        # Transcription can take minutes, only the connect has a timeout
+        sock.settimeout(None)
+        send_message(sock, {"client": f"{socket.gethostname()}:{os.getpid()}", "model": model_name,
+                            "options": options, "samples": len(audio)}, audio.tobytes())
+        with sock.makefile("rb") as rfile:
+            reply = read_message(rfile)
+    if reply is None or "error" in reply:
+        raise RuntimeError(f"Transcription server failed: {reply and reply['error']}")
+    return reply["segments"]
+
+def load_audio(path, duration, sample_rate=whisper.audio.SAMPLE_RATE):
+    """Decode first duration seconds of audio to mono float32 at Whisper's sample rate."""
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-t", f"{duration:.3f}",
+           "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    # Read ffmpeg output straight into the final array instead of collecting bytes first
+    audio = np.empty(int(duration * sample_rate) + sample_rate, dtype=np.float32)
+    buffer = memoryview(audio).cast("B")
+    filled = 0
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+        while filled < len(buffer):
+            count = process.stdout.readinto(buffer[filled:])
+            if not count:
+                break
+            filled += count
+        process.stdout.close()
+        error = process.stderr.read().decode(errors="replace")
+    if process.returncode != 0:
+        raise RuntimeError(f"Failed to load audio: {error}")
+    return audio[:filled // 4]
+
+def find_chunks(audio, chunk_seconds, overlap, sample_rate=whisper.audio.SAMPLE_RATE):
+    """Split audio near every chunk_seconds at the quietest place.
+
+    Returns (start, end, own_start, own_end) in samples: start/end include the overlap,
+    own_start/own_end is the part whose segments are kept.
+    """
+    window = sample_rate // 50
+    count = len(audio) // window
+    if count == 0 or len(audio) <= chunk_seconds * sample_rate:
+        return [(0, len(audio), 0, len(audio))]
+    energy = np.square(audio[:count * window].reshape(count, window)).mean(axis=1)
+    # Smooth over ~0.3 s so a pause wins over a single quiet window
+    energy = np.convolve(energy, np.ones(15) / 15, mode="same")
+    chunk = int(chunk_seconds * 50)
+    splits = [0]
+    while count - splits[-1] > chunk * 5 // 4:
+        target = splits[-1] + chunk
+        low, high = target - chunk // 4, target + chunk // 4
+        splits.append(low + int(np.argmin(energy[low:high])))
+    bounds = [split * window for split in splits] + [len(audio)]
+    pad = int(overlap * sample_rate)
+    return [(max(0, own_start - pad), min(len(audio), own_end + pad), own_start, own_end)
+            for own_start, own_end in zip(bounds, bounds[1:])]
+
+loaded_models = {}
+worker_model = None
+
+def get_model(model_name):
+    """Load model once per process."""
+    if model_name not in loaded_models:
+        loaded_models[model_name] = whisper.load_model(model_name)
+    return loaded_models[model_name]
+
+def init_worker(model_name, threads):
+    """Load the model once per worker process."""
+    global worker_model
+    torch.set_num_threads(threads)
+    worker_model = whisper.load_model(model_name)
+
+def transcribe_chunk(audio, options):
+    return worker_model.transcribe(audio, **options)["segments"]
+
+def transcribe_parallel(audio, model_name, options, workers, chunk_seconds, overlap=1.0,
+                        sample_rate=whisper.audio.SAMPLE_RATE):
+    """Transcribe audio chunks in parallel and stitch segments back together."""
+    chunks = find_chunks(audio, chunk_seconds, overlap)
+    workers = min(workers, len(chunks))
+    print(f"INFO: Transcribing {len(chunks)} chunks with {workers} workers...")
+    # spawn: forked workers would share torch's thread pools with this process
+    context = multiprocessing.get_context("spawn")
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                             initargs=(model_name, threads)) as executor:
+        results = executor.map(transcribe_chunk, [audio[start:end] for start, end, _, _ in chunks],
+                               [options] * len(chunks))
+        segments = []
+        for (start, _, own_start, own_end), chunk_segments in zip(chunks, results):
+            offset = start / sample_rate
+            for seg in chunk_segments:
+                seg["start"] += offset
+                seg["end"] += offset
+                for word in seg.get("words", []):
+                    word["start"] += offset
+                    word["end"] += offset
+                # Overlapping audio is transcribed twice, keep the copy from the chunk that owns it
+                middle = (seg["start"] + seg["end"]) / 2 * sample_rate
+                if own_start <= middle < own_end:
+                    seg["id"] = len(segments)
+                    segments.append(seg)
+    return segments
+
+def transcribe(audio_path, duration, model_name, options, server=None, workers=1, chunk_seconds=60, stats=None):
+    """Run Whisper on audio file and return raw segments."""
+    stats = stats or StageTimer()
+    with stats.stage("audio_decode"):
+        audio = load_audio(audio_path, duration)
+    if workers > 1:
+        with stats.stage("transcription"):
+            return transcribe_parallel(audio, model_name, options, workers, chunk_seconds)
+    if server:
+        with stats.stage("transcription"):
+            segments = transcribe_remote(server, model_name, audio, options)
+        if segments is not None:
+            return segments
+        print("INFO: Transcription server not running, loading model...")
+    with stats.stage("model_load"):
+        model = get_model(model_name)
+    with stats.stage("transcription"):
+        return model.transcribe(audio, **options)["segments"]
+
+def filter_segments(segments, speech_threshold, min_duration, merge_threshold):
+    """Drop non-speech and short segments and merge close ones."""
+    filtered_segments = []
+    for seg in segments:
+        # Filter out non-speech segments    
+        if seg.get('no_speech_prob', 1) > (1 - speech_threshold):
+            continue
+            
+        # Apply minimum duration
+        if seg['end'] - seg['start'] < min_duration:
+            continue
+            
+        filtered_segments.append(dict(seg))
+
+    # Merge adjacent segments
+    merged_segments = []
+    for seg in filtered_segments:
+        if not merged_segments:
+            merged_segments.append(seg)
+        else:
+            last = merged_segments[-1]
+            if seg['start'] - last['end'] < merge_threshold:
+                # Merge segments
+                last['end'] = seg['end']
+                last['text'] += " " + seg['text'].strip()
+                if 'words' in last and 'words' in seg:
+                    last['words'] = last['words'] + seg['words']
+            else:
+                merged_segments.append(seg)
+    return merged_segments
+
+def div255(v):
+    """Rounded v / 255 for uint16 arrays (same rounding as PIL)."""
+    v = v + 128
+    return (v + (v >> 8)) >> 8
+
+class SubtitleLayer:
+    """Dims background frames and draws the active subtitles on them.
+
+    Every subtitle is rendered once into a cropped sprite, the active ones are found
+    with a sorted interval index, so frame cost doesn't depend on how many lines there are.
+    """
+
+    def __init__(self, segments, size, font, font_size, font_color, opacity, highlight_color=None):
+        alpha = int(opacity * 255)
+        # Dimmed value for every possible pixel value, same result as a black overlay clip
+        self.dim = div255(np.arange(256, dtype=np.uint16) * (255 - alpha)).astype(np.uint8)
+        pil_font = ImageFont.truetype(font, font_size)
+        self.sprites = []
+        times = set()
+        for seg in segments:
+            sprite = self.make_sprite(seg["text"], size, font, font_size, font_color)
+            if sprite is None:
+                continue
+            words = []
+            if highlight_color and seg.get("words"):
+                boxes = word_boxes(seg["text"], seg["words"], seg["end"], size, pil_font)
+                words = self.make_highlights(boxes, sprite, highlight_color)
+            self.sprites.append((seg["start"], seg["end"]) + sprite + (words,))
+            times.update((seg["start"], seg["end"]))
+        # Split timeline at every start/end, each piece knows which sprites are visible
+        self.bounds = sorted(times)
+        self.active = [[i for i, sprite in enumerate(self.sprites) if sprite[0] <= t < sprite[1]]
+                       for t in self.bounds]
+
+    @staticmethod
+    def make_sprite(text, size, font, font_size, font_color):
+        """Render text like the full frame TextClip did and crop it to its visible pixels."""
+        clip = TextClip(text=text, font=font, font_size=font_size, color=font_color,
+                        method='label', size=size)
+        rgb = clip.get_frame(0).astype(np.uint16)
+        mask = (clip.mask.get_frame(0) * 255).astype(np.uint8)
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        if len(rows) == 0:
+            return None
+        y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        mask = mask[y0:y1, x0:x1, None].astype(np.uint16)
+        return (slice(y0, y1), slice(x0, x1)), rgb[y0:y1, x0:x1] * mask, 255 - mask
+
+    @staticmethod
+    def make_highlights(boxes, sprite, highlight_color):
+        """Cut the sprite's glyph mask into words, each with its own highlight colored pixels."""
+        region, _, inverse = sprite
+        color = np.array(ImageColor.getrgb(highlight_color)[:3], dtype=np.uint16)
+        words = []
+        for start, end, (x0, y0, x1, y1), _ in boxes:
+            top, bottom = max(y0, region[0].start), min(y1, region[0].stop)
+            left, right = max(x0, region[1].start), min(x1, region[1].stop)
+            if top >= bottom or left >= right:
+                continue
+            word = (slice(top - region[0].start, bottom - region[0].start),
+                    slice(left - region[1].start, right - region[1].start))
+            words.append((start, end, word, color * (255 - inverse[word])))
+        return words
+
+    def visible(self, t):
+        """Sprites shown at time t."""
+        i = bisect.bisect_right(self.bounds, t) - 1
+        return self.active[i] if i >= 0 else []
+
+    def apply(self, frame, t):
+        """Return dimmed frame with subtitles for time t."""
+        frame = self.dim[frame]
+        for i in self.visible(t):
+            _, _, region, premultiplied, inverse, words = self.sprites[i]
+            background = frame[region]
+            blended = background * inverse + premultiplied
+            for start, end, word, highlight in words:
+                if start <= t < end:
+                    blended[word] = background[word] * inverse[word] + highlight
+            frame[region] = div255(blended)
+        return frame
+
+def ass_time(t):
+    """Format seconds as ASS timestamp (H:MM:SS.cc)."""
+    cs = int(round(t * 100))
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+def font_metrics(path):
+    """Return (units per em, ascent, descent) the way libass sizes fonts (OS/2 win metrics)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    tables = {}
+    for i in range(struct.unpack(">H", data[4:6])[0]):
+        tag, _, offset, _ = struct.unpack(">4sIII", data[12 + 16 * i:28 + 16 * i])
+        tables[tag] = offset
+    units = struct.unpack(">H", data[tables[b"head"] + 18:tables[b"head"] + 20])[0]
+    if b"OS/2" in tables:
+        ascent, descent = struct.unpack(">HH", data[tables[b"OS/2"] + 74:tables[b"OS/2"] + 78])
+    else:
+        ascent, descent = struct.unpack(">hh", data[tables[b"hhea"] + 4:tables[b"hhea"] + 8])
+        descent = -descent
+    return units, ascent, descent
+
+def text_layout(text, size, pil_font, spacing=4):
+    """Return (line, x, baseline) for text centered in frame, same layout as TextClip(method='label')."""
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    left, top, right, bottom = draw.multiline_textbbox((0, 0), text, font=pil_font, spacing=spacing, anchor="ls")
+    x = (size[0] - int(right - left)) / 2
+    y = (size[1] - int(bottom - top)) / 2 + pil_font.getmetrics()[0]
+    line_height = draw.textbbox((0, 0), "A", font=pil_font)[3] + spacing
+    return [(line, x, y + i * line_height) for i, line in enumerate(text.split("\n"))]
+
+def word_boxes(text, words, end, size, pil_font):
+    """Return (start, end, (x0, y0, x1, y1), line number) of every word of a laid out subtitle.
+
+    Boxes reach to the middle of the spaces around the word, so they hold only that word's glyphs.
+    """
+    ascent, descent = pil_font.getmetrics()
+    space = pil_font.getlength(" ")
+    boxes = []
+    for number, (line, x, baseline) in enumerate(text_layout(text, size, pil_font)):
+        position = 0
+        for token in line.split():
+            first = line.index(token, position)
+            position = first + len(token)
+            left = x + pil_font.getlength(line[:first]) - space / 2
+            right = x + pil_font.getlength(line[:position]) + space / 2
+            boxes.append(((int(left), int(baseline - ascent), int(np.ceil(right)), int(baseline + descent)), number))
+    # Words were edited into something that doesn't match the text, don't guess
+    if len(boxes) != len(words):
+        return []
+    ends = [word["start"] for word in words[1:]] + [end]
+    return [(word["start"], word_end, box, number)
+            for word, word_end, (box, number) in zip(words, ends, boxes) if word_end > word["start"]]
+
+def write_ass(segments, filename, size, font, font_size, font_color, highlight_color=None):
+    """Write segments as ASS subtitles placed like the MoviePy render."""
+    pil_font = ImageFont.truetype(font, font_size)
+    family = pil_font.getname()[0]
+    units, ascent, descent = font_metrics(font)
+    # libass font size is ascent + descent, PIL font size is the em size
+    ass_size = font_size * (ascent + descent) / units
+    r, g, b = ImageColor.getrgb(font_color)[:3]
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("[Script Info]\nScriptType: v4.00+\n")
+        f.write(f"PlayResX: {size[0]}\nPlayResY: {size[1]}\nWrapStyle: 2\nScaledBorderAndShadow: yes\n\n")
+        f.write("[V4+ Styles]\n")
+        f.write("Format: Name, Fontname, Fontsize, PrimaryColour, BorderStyle, Outline, Shadow, Alignment, "
+                "MarginL, MarginR, MarginV\n")
+        f.write(f"Style: Default,{family},{ass_size:.2f},&H00{b:02X}{g:02X}{r:02X},1,0,0,1,0,0,0\n\n")
+        f.write("[Events]\nFormat: Layer, Start, End, Style, Text\n")
+        if highlight_color:
+            r, g, b = ImageColor.getrgb(highlight_color)[:3]
+            highlight = f"&H{b:02X}{g:02X}{r:02X}&"
+        for seg in segments:
+            # One event per line with fixed position, so libass doesn't move overlapping lines
+            lines = []
+            for line, x, baseline in text_layout(seg["text"], size, pil_font):
+                line = line.replace("{", "(").replace("}", ")")
+                position = f"\\pos({x:.2f},{baseline + font_size * descent / units:.2f})"
+                lines.append((line, position))
+                f.write(f"Dialogue: 0,{ass_time(seg['start'])},{ass_time(seg['end'])},Default,"
+                        f"{{{position}}}{line}\n")
+            if not (highlight_color and seg.get("words")):
+                continue
+            # Karaoke: the word's line again in highlight color, clipped to the word
+            for start, end, (x0, y0, x1, y1), number in word_boxes(seg["text"], seg["words"], seg["end"],
+                                                                   size, pil_font):
+                line, position = lines[number]
+                f.write(f"Dialogue: 1,{ass_time(start)},{ass_time(end)},Default,"
+                        f"{{{position}\\c{highlight}\\clip({x0},{y0},{x1},{y1})}}{line}\n")
+
+def render_ffmpeg(segments, background, audio, output, duration, fps, font, font_size, font_color, opacity, size,
+                  start=0, preset="medium", crf=23, threads=0, highlight_color=None):
+    """Trim, scale, dim, burn in subtitles and mux audio in one ffmpeg run.
+
+    With start the inputs are read from there and subtitle times are relative to it,
+    without audio only the video is written.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Run ffmpeg inside temp_dir so the filter graph only sees plain relative names
+        write_ass(segments, os.path.join(temp_dir, "subtitles.ass"), size, font, font_size, font_color,
+                  highlight_color)
+        shutil.copy(font, os.path.join(temp_dir, os.path.basename(font)))
+        # Dim in RGB like the MoviePy path (drawbox with alpha mixes up chroma on yuv420p input)
+        dim = (255 - int(opacity * 255)) / 255
+        graph = (f"[0:v]fps={fps},scale={size[0]}:{size[1]},format=rgb24,"
+                 f"lutrgb=r=val*{dim}:g=val*{dim}:b=val*{dim},"
+                 f"subtitles=subtitles.ass:fontsdir=.,format=yuv420p[v]")
+        cmd = ["ffmpeg", "-y", "-v", "error", "-stats", "-ss", f"{start:.3f}", "-i", os.path.abspath(background)]
+        if audio is not None:
+            cmd += ["-ss", f"{start:.3f}", "-i", os.path.abspath(audio)]
+        cmd += ["-filter_complex", graph, "-map", "[v]", "-t", f"{duration:.3f}", "-c:v", "libx264",
+                "-preset", preset, "-crf", str(crf), "-threads", str(threads)]
+        cmd += ["-map", "1:a", "-c:a", "aac"] if audio is not None else ["-an"]
+        subprocess.run(cmd + [os.path.abspath(output)], cwd=temp_dir, check=True)
+
+def segment_subtitles(subtitles, start, end):
+    """Subtitles visible between start and end, with times relative to start."""
+    visible = []
+    for sub in subtitles:
+        if sub["start"] < end and sub["end"] > start:
+            part = {"start": round(max(sub["start"], start) - start, 3),
+                    "end": round(min(sub["end"], end) - start, 3), "text": sub["text"]}
+            if sub.get("words"):
+                part["words"] = [{"word": word["word"], "start": round(max(word["start"], start) - start, 3)}
+                                 for word in sub["words"]]
+            visible.append(part)
+    return visible
+
+def render_part(job, background, subtitles, start, end, path):
+    """Render video only part of the output between start and end."""
+    temp_path = path[:-len(".mp4")] + ".part.mp4"
+    if job.backend == "ffmpeg":
+        render_ffmpeg(subtitles, job.background, None, temp_path, end - start, job.fps,
+                      job.font, job.font_size, job.font_color, job.opacity, background.size, start=start,
+                      preset=job.preset, crf=job.crf, threads=job.threads, highlight_color=job.highlight_color)
+    else:
+        layer = SubtitleLayer(subtitles, background.size, job.font, job.font_size, job.font_color, job.opacity,
+                              job.highlight_color)
+        decode = job.stats.timed("decode", background.subclipped(start, end).get_frame)
+        apply = job.stats.timed("composite", layer.apply)
+        part = background.subclipped(start, end).transform(lambda get_frame, t: apply(decode(t), t))
+        part.write_videofile(temp_path, fps=job.fps, codec="libx264", audio=False, preset=job.preset,
+                             threads=job.threads or None, ffmpeg_params=["-crf", str(job.crf)], logger=None)
+    os.replace(temp_path, path)
+
+def concat_parts(paths, audio, output, duration):
+    """Join rendered parts without re-encoding and add the audio."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        list_path = os.path.join(temp_dir, "parts.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in paths:
+                f.write("file '" + os.path.abspath(path).replace("'", "'\\''") + "'\n")
+        cmd = ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+               "-i", os.path.abspath(audio), "-map", "0:v", "-map", "1:a", "-c:v", "copy", "-c:a", "aac",
+               "-t", f"{duration:.3f}", os.path.abspath(output)]
+        subprocess.run(cmd, check=True)
+
+def render_incremental(job, background, subtitles, video_duration):
+    """Render output from cached parts, re-rendering only parts whose subtitles changed.
+
+    Parts and a manifest of their subtitles are kept in <output>_parts next to the output.
+    """
+    parts_dir = os.path.splitext(job.output)[0] + "_parts"
+    manifest_path = os.path.join(parts_dir, "manifest.json")
+    os.makedirs(parts_dir, exist_ok=True)
+    # Anything besides the subtitles that changes pixels invalidates every part
+    settings = {"background": [os.path.abspath(job.background), os.path.getsize(job.background),
+                               os.path.getmtime(job.background)],
+                "font": [os.path.abspath(job.font), os.path.getmtime(job.font)],
+                "duration": round(video_duration, 3), "fps": job.fps, "font_size": job.font_size,
+                "font_color": job.font_color, "opacity": job.opacity, "backend": job.backend,
+                "preset": job.preset, "crf": job.crf, "highlight_color": job.highlight_color,
+                "segment_seconds": job.segment_seconds}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    old_parts = manifest.get("parts", []) if manifest.get("settings") == settings else []
+    manifest = {"settings": settings, "parts": list(old_parts)}
+
+    # Part length is a whole number of frames so parts join without drift
+    step = max(1, round(job.segment_seconds * job.fps)) / job.fps
+    count = max(1, int(np.ceil(video_duration / step - 1e-6)))
+    paths = []
+    rendered = 0
+    for i in range(count):
+        start = round(i * step, 3)
+        end = round(min((i + 1) * step, video_duration), 3)
+        part = {"file": f"part_{i:04d}.mp4", "start": start, "end": end,
+                "subtitles": segment_subtitles(subtitles, start, end)}
+        path = os.path.join(parts_dir, part["file"])
+        paths.append(path)
+        if i < len(old_parts) and old_parts[i] == part and os.path.exists(path):
+            continue
+        print(f"INFO: Rendering part {i + 1}/{count} ({start:.1f}s - {end:.1f}s)...")
+        with job.stats.stage("export"):
+            render_part(job, background, part["subtitles"], start, end, path)
+        rendered += 1
+        # Save after every part so an interrupted run never trusts a stale entry
+        manifest["parts"] = manifest["parts"][:i] + [part] + manifest["parts"][i + 1:]
+        with open(manifest_path + ".part", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(manifest_path + ".part", manifest_path)
+    print(f"INFO: Re-rendered {rendered} of {count} parts, joining...")
+    with job.stats.stage("concat"):
+        concat_parts(paths, job.audio, job.output, video_duration)
+
+def load_media(job, size=None):
+    """Open background (resized by ffmpeg while decoding) and audio trimmed to the shorter of both."""
+    background = VideoFileClip(job.background, target_resolution=size)
+    audio_clip = AudioFileClip(job.audio)
     video_duration = min(background.duration, audio_clip.duration)
     background = background.subclipped(0, video_duration)
     audio_clip = audio_clip.subclipped(0, video_duration)
+    return background, audio_clip, video_duration
 
-    if not args.usetext:
-        # Transcribe with Whisper
-        print("INFO: Transcribing audio with AI model...")
-        with tempfile.NamedTemporaryFile(suffix=".wav") as tmp_audio:
-            audio_clip.write_audiofile(tmp_audio.name, codec='pcm_s16le', logger=None)
-            model = whisper.load_model("large-v3")   # base (less than 300 MBs) / medium (more than 1.5 GBs) / large-v3 (more than 2.8 GBs)
-            result = model.transcribe(tmp_audio.name, word_timestamps=False)
-
-        # Process segments
-        print("INFO: Processing segments...")
-        filtered_segments = []
-        for seg in result["segments"]:
-            # Filter out non-speech segments    
-            if seg.get('no_speech_prob', 1) > (1 - args.speech_threshold):
-                continue
-                
-            # Apply minimum duration
-            if seg['end'] - seg['start'] < args.min_duration:
-                continue
-                
-            filtered_segments.append(seg)
+def make_subtitles(job):
+    """Transcribe job audio and write subtitles to job.text for editing."""
+    with job.stats.stage("load_media"):
+        background, audio_clip, video_duration = load_media(job)
+    background.close()
+    audio_clip.close()
 
-        # Merge adjacent segments
-        merged_segments = []
-        for seg in filtered_segments:
-            if not merged_segments:
-                merged_segments.append(seg)
-            else:
-                last = merged_segments[-1]
-                if seg['start'] - last['end'] < args.merge_threshold:
-                    # Merge segments
-                    last['end'] = seg['end']
-                    last['text'] += " " + seg['text'].strip()
-                else:
-                    merged_segments.append(seg)
-
-        # Create text.txt
-        print("INFO: Writing subtitles to text.txt for editing...")
-        write_srt(merged_segments, filename="text.txt")
-        print("INFO: Please edit text.txt as needed! Press ENTER to continue.")
-        input()
+    # Transcribe with Whisper (raw segments are cached, filtering below is cheap)
+    options = {"word_timestamps": job.karaoke}
+    key_options = dict(options)
+    if job.workers > 1:
+        # Chunked results differ a little from one pass, don't mix them in the cache
+        key_options["chunk_seconds"] = job.chunk_seconds
+    with job.stats.stage("audio_hash"):
+        key = transcript_key(file_hash(job.audio), video_duration, job.model, key_options)
+    segments = None if job.no_cache else load_transcript(job.cache_dir, key)
+    if segments is not None:
+        print("INFO: Using cached transcription.")
     else:
-        print("INFO: Skipping transcription phase. Using subtitles from text.txt.")
+        print("INFO: Transcribing audio with AI model...")
+        segments = transcribe(job.audio, video_duration, job.model, options, job.server,
+                              job.workers, job.chunk_seconds, job.stats)
+        if not job.no_cache:
+            save_transcript(job.cache_dir, key, segments)
+
+    # Process segments
+    print("INFO: Processing segments...")
+    with job.stats.stage("filter"):
+        merged_segments = filter_segments(segments, job.speech_threshold, job.min_duration,
+                                          job.merge_threshold)
+
+    print(f"INFO: Writing subtitles to {job.text} for editing...")
+    with job.stats.stage("write_subtitles"):
+        write_srt(merged_segments, filename=job.text, karaoke=job.karaoke)
 
-    # Read text.txt
-    print("INFO: Reading edited subtitles from text.txt...")
-    edited_segments = read_srt(filename="text.txt")
+def preview_job(job, size):
+    """Copy of job that renders a quick low resolution, low frame rate preview."""
+    scale = min(1, job.preview_height / size[1])
+    # libx264 needs even dimensions
+    width = max(2, int(size[0] * scale / 2) * 2)
+    height = max(2, int(size[1] * scale / 2) * 2)
+    stem, extension = os.path.splitext(job.output)
+    return argparse.Namespace(**{**vars(job), "size": (width, height), "font_size": max(1, round(job.font_size * scale)),
+                                 "fps": min(job.fps, job.preview_fps), "preset": "ultrafast", "crf": 30,
+                                 "threads": 0, "incremental": False, "output": stem + "_preview" + extension})
+
+def preview_window(segments, lines, margin, duration):
+    """Time range around the given subtitle numbers (1 based, as in the subtitle file)."""
+    selected = [segments[int(line) - 1] for line in lines.split(",") if 0 < int(line) <= len(segments)]
+    if not selected:
+        return 0, duration
+    start = max(0, min(seg["start"] for seg in selected) - margin)
+    end = min(duration, max(seg["end"] for seg in selected) + margin)
+    return round(start, 3), round(end, 3)
+
+def render_video(job):
+    """Render job.output from background, audio and the subtitles in job.text."""
+    print(f"INFO: Reading edited subtitles from {job.text}...")
+    with job.stats.stage("read_subtitles"):
+        edited_segments = read_srt(filename=job.text)
     if not edited_segments:
-        print("ERROR: No subtitles found in text.txt, aborting.")
-        return
+        raise ValueError(f"No subtitles found in {job.text}")
+
+    print("INFO: Loading background video and audio...")
+    with job.stats.stage("load_media"):
+        background, audio_clip, video_duration = load_media(job)
+        if job.preview:
+            job = preview_job(job, background.size)
+            background.close()
+            audio_clip.close()
+            background, audio_clip, video_duration = load_media(job, job.size)
+    if job.preview:
+        print(f"INFO: Preview at {job.size[0]}x{job.size[1]}, {job.fps} fps -> {job.output}")
 
-    # Create subtitle clips
-    print("INFO: Creating subtitle clips...")
-    subtitle_clips = []
+    # Collect subtitles
+    print("INFO: Preparing subtitles...")
+    subtitles = []
     for seg in edited_segments:
         start = max(0, seg["start"])
         end = min(seg["end"], video_duration)
@@ -162,30 +759,223 @@ def main():
             continue
             
         text = seg["text"].strip()
-        wrapped_text = "\n".join(textwrap.wrap(text, width=40))
-        
-        txt_clip = (TextClip(text=wrapped_text, font=args.font, font_size=args.font_size,
-                           color=args.font_color, method='label', size=background.size)
-                   .with_position('center')
-                   .with_start(start)
-                   .with_duration(end - start))
-        subtitle_clips.append(txt_clip)
+        words = seg.get("words") if job.karaoke else None
+        # Karaoke lines break only between words, like tag_words, so word_boxes finds one box per word
+        wrapped_text = "\n".join(textwrap.wrap(text, width=40, break_long_words=not words, break_on_hyphens=not words))
+        subtitles.append({"start": start, "end": end, "text": wrapped_text})
+        if words:
+            subtitles[-1]["words"] = words
+
+    window_start = 0
+    if job.preview and job.preview_lines:
+        window_start, window_end = preview_window(edited_segments, job.preview_lines, job.preview_margin,
+                                                  video_duration)
+        print(f"INFO: Previewing {window_start:.1f}s - {window_end:.1f}s")
+        subtitles = segment_subtitles(subtitles, window_start, window_end)
+        background = background.subclipped(window_start, window_end)
+        audio_clip = audio_clip.subclipped(window_start, window_end)
+        video_duration = window_end - window_start
+
+    if job.incremental:
+        render_incremental(job, background, subtitles, video_duration)
+        background.close()
+        audio_clip.close()
+        print("INFO: Video exported successfully.")
+        return
+
+    if job.backend == "ffmpeg":
+        print("INFO: Exporting video with ffmpeg...")
+        size = background.size
+        background.close()
+        audio_clip.close()
+        with job.stats.stage("export"):
+            render_ffmpeg(subtitles, job.background, job.audio, job.output, video_duration, job.fps,
+                          job.font, job.font_size, job.font_color, job.opacity, size, start=window_start,
+                          preset=job.preset, crf=job.crf, threads=job.threads,
+                          highlight_color=job.highlight_color)
+        print("INFO: Video exported successfully.")
+        return
+
+    with job.stats.stage("subtitle_layer"):
+        layer = SubtitleLayer(subtitles, background.size, job.font, job.font_size, job.font_color, job.opacity,
+                              job.highlight_color)
 
     # Create final video
     print("INFO: Creating final video...")
-    overlay = ColorClip(
-        background.size, 
-        color=(0,0,0), 
-        duration=video_duration
-    ).with_opacity(args.opacity)
-
-    final = CompositeVideoClip([background, overlay] + subtitle_clips)
+    decode = job.stats.timed("decode", background.get_frame)
+    apply = job.stats.timed("composite", layer.apply)
+    final = background.transform(lambda get_frame, t: apply(decode(t), t))
     final = final.with_audio(audio_clip)
     
     print("INFO: Exporting video...")
-    final.write_videofile(args.output, fps=args.fps, codec="libx264", audio_codec="aac")
+    with job.stats.stage("export"):
+        final.write_videofile(job.output, fps=job.fps, codec="libx264", audio_codec="aac", preset=job.preset,
+                              threads=job.threads or None, ffmpeg_params=["-crf", str(job.crf)])
+    final.close()
+    audio_clip.close()
     print("INFO: Video exported successfully.")
 
+def load_batch(path, args):
+    """Jobs from a JSON manifest.
+
+    The manifest is a list of objects with "audio" and "background" and optionally "output",
+    "text" (subtitle file), "review" and any style option (font, font_size, font_color, opacity, ...).
+    Missing options come from the command line, relative paths are relative to the manifest.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for item in items:
+        job = argparse.Namespace(**{**vars(args), **item})
+        job.audio = os.path.join(base, job.audio)
+        job.background = os.path.join(base, job.background)
+        if "output" in item:
+            job.output = os.path.join(base, item["output"])
+        else:
+            job.output = os.path.splitext(job.audio)[0] + "_subtitles.mp4"
+        if "text" in item:
+            job.text = os.path.join(base, item["text"])
+        else:
+            job.text = os.path.splitext(job.output)[0] + ".txt"
+        if "font" in item:
+            job.font = os.path.join(base, item["font"])
+        job.stats = StageTimer()
+        jobs.append(job)
+    return jobs
+
+def run_stage(name, fn, inbox, outbox):
+    """Take jobs from inbox, run fn on them and pass them on; None ends the stage."""
+    for job in iter(inbox.get, None):
+        try:
+            fn(job)
+            outbox.put(job)
+        except Exception as e:
+            print(f"ERROR: {name} failed for {job.output}: {e}")
+    outbox.put(None)
+
+def review_subtitles(job):
+    """Wait until the user has checked this job's subtitles."""
+    if job.review:
+        print(f"INFO: Please edit {job.text} for {job.output}! Press ENTER to continue.")
+        input()
+
+def run_batch(jobs):
+    """Transcribe, review and render jobs as a pipeline.
+
+    Each stage works on the next song while the later stages are still busy,
+    so a batch takes about as long as its slowest stage.
+    """
+    todo = queue.Queue()
+    for job in jobs:
+        todo.put(job)
+    todo.put(None)
+    transcribed = queue.Queue()
+    reviewed = queue.Queue()
+    done = queue.Queue()
+
+    def transcribe_job(job):
+        if job.usetext:
+            print(f"INFO: Using subtitles from {job.text}.")
+        else:
+            make_subtitles(job)
+
+    stages = [threading.Thread(target=run_stage, args=("Transcription", transcribe_job, todo, transcribed)),
+              threading.Thread(target=run_stage, args=("Review", review_subtitles, transcribed, reviewed)),
+              threading.Thread(target=run_stage, args=("Render", render_video, reviewed, done))]
+    for stage in stages:
+        stage.start()
+    for stage in stages:
+        stage.join()
+    finished = list(iter(done.get, None))
+    print(f"INFO: Batch finished, {len(finished)} of {len(jobs)} videos exported.")
+    return finished
+
+def build_parser():
+    """Command line options, also used by benchmark.py."""
+    parser = argparse.ArgumentParser(
+        description="Create video with subtitles"
+    )
+    parser.add_argument("--audio", help="Audio file")
+    parser.add_argument("--background", help="Video file")
+    parser.add_argument("--output", default="output.mp4", help="Output file")
+    parser.add_argument("--font", default="mainfont.ttf", help="Font")
+    parser.add_argument("--font_size", default=40, type=int, help="Font size")
+    parser.add_argument("--font_color", default="white", type=str, help="Font color")
+    parser.add_argument("--opacity", default=0.5, type=float, help="Background opacity")
+    parser.add_argument("--min_duration", default=0.3, type=float, 
+                      help="Minimum subtitle duration in seconds")
+    parser.add_argument("--merge_threshold", default=0, type=float,
+                      help="Merge segments closer than this threshold")
+    parser.add_argument("--speech_threshold", default=0.1, type=float,
+                      help="Minimum speech probability to keep segment")
+    parser.add_argument("--fps", default=24, type=int, help="Set video framerate")
+    parser.add_argument("--usetext", action="store_true", help="Skips AI STT and makes video using --text data")
+    parser.add_argument("--backend", default="moviepy", choices=["moviepy", "ffmpeg"],
+                      help="Render with MoviePy or burn subtitles in with a single ffmpeg run")
+    parser.add_argument("--model", default=MODEL_NAME, help="Whisper model (tiny, base, small, medium, large-v3...)")
+    parser.add_argument("--server", default=DEFAULT_ADDRESS, help="whisperserver.py address, empty to always load the model here")
+    parser.add_argument("--workers", default=1, type=int,
+                      help="Split long audio at pauses and transcribe chunks in parallel (use a small model)")
+    parser.add_argument("--chunk_seconds", default=60, type=float, help="Target chunk length for --workers")
+    parser.add_argument("--cache_dir", default=CACHE_DIR, help="Folder for cached transcriptions")
+    parser.add_argument("--no_cache", action="store_true", help="Always transcribe, ignore cached transcriptions")
+    parser.add_argument("--incremental", action="store_true",
+                      help="Keep rendered parts and only re-render parts whose subtitles changed")
+    parser.add_argument("--segment_seconds", default=10, type=float, help="Part length for --incremental")
+    parser.add_argument("--preset", default="medium", help="x264 preset for the export")
+    parser.add_argument("--crf", default=23, type=int, help="x264 quality for the export (lower is better)")
+    parser.add_argument("--threads", default=0, type=int, help="Encoder threads, 0 for automatic")
+    parser.add_argument("--preview", action="store_true",
+                      help="Quick low resolution render to <output>_preview.mp4 for checking timing")
+    parser.add_argument("--preview_height", default=360, type=int, help="Preview video height")
+    parser.add_argument("--preview_fps", default=12, type=int, help="Preview frame rate")
+    parser.add_argument("--preview_lines", default=None,
+                      help="Only preview around these subtitle numbers, e.g. 3,7")
+    parser.add_argument("--preview_margin", default=2.0, type=float, help="Seconds shown around --preview_lines")
+    parser.add_argument("--karaoke", action="store_true",
+                      help="Keep word timings (as <time> tags in the subtitle file) and highlight the sung word")
+    parser.add_argument("--highlight_color", default="yellow", help="Color of the highlighted word with --karaoke")
+    parser.add_argument("--text", default="text.txt", help="Subtitle file to write/read")
+    parser.add_argument("--batch", default=None, help="JSON manifest of songs to process as a pipeline")
+    parser.add_argument("--review", action="store_true", help="In batch mode, wait for ENTER after each transcription")
+    parser.add_argument("--stats", dest="stats_path", default=None,
+                      help="Write per-stage timings and peak memory as JSON to this file (- for stdout)")
+    return parser
+
+def job_report(job):
+    """Stats report of one finished job."""
+    return job.stats.report(output=job.output, backend=job.backend)
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    args.stats = StageTimer()
+
+    if args.batch:
+        jobs = load_batch(args.batch, args)
+        finished = run_batch(jobs)
+        if args.stats_path:
+            write_stats([dict(job_report(job), exported=job in finished) for job in jobs], args.stats_path)
+        return
+    if not (args.audio and args.background):
+        parser.error("--audio and --background are required")
+
+    if not args.usetext:
+        make_subtitles(args)
+        print(f"INFO: Please edit {args.text} as needed! Press ENTER to continue.")
+        with args.stats.stage("review"):
+            input()
+    else:
+        print(f"INFO: Skipping transcription phase. Using subtitles from {args.text}.")
+
+    try:
+        render_video(args)
+    except ValueError as e:
+        print(f"ERROR: {e}, aborting.")
+        return
+    if args.stats_path:
+        write_stats(job_report(args), args.stats_path)
+
 if __name__ == "__main__":
     main()
-
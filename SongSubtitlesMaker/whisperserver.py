@@ -0,0 +1,168 @@
+#
+# Keeps Whisper models loaded so makevideo.py doesn't have to load them for every song.
+#
+# Start it once: python whisperserver.py --models large-v3
+# makevideo.py uses it automatically when it is running (see --server), otherwise it loads the model itself.
+#
+# Jobs are run one at a time (one transcription already uses all CPU cores),
+# clients take turns so one batch can't block everyone else.
+#
+# Requirements: pip install openai-whisper numpy
+#
+
+import argparse
+import json
+import socketserver
+import threading
+from collections import OrderedDict, deque
+import numpy as np
+import whisper
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+def parse_address(address):
+    """Split host:port."""
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+def send_message(sock, message, payload=b""):
+    """Send one JSON header line followed by raw payload."""
+    sock.sendall(json.dumps(message, default=float).encode("utf-8") + b"\n" + payload)
+
+def read_message(rfile):
+    """Read one JSON header line, None on closed connection."""
+    line = rfile.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+def read_payload(rfile, size):
+    """Read exactly size bytes."""
+    data = bytearray()
+    while len(data) < size:
+        block = rfile.read(size - len(data))
+        if not block:
+            raise ConnectionError("Connection closed while reading audio")
+        data += block
+    return bytes(data)
+
+class ModelPool:
+    """Loaded models, least recently used one is dropped when there are too many."""
+
+    def __init__(self, max_models):
+        self.max_models = max_models
+        self.models = OrderedDict()
+
+    def get(self, name):
+        if name in self.models:
+            self.models.move_to_end(name)
+            return self.models[name]
+        while len(self.models) >= self.max_models:
+            dropped, _ = self.models.popitem(last=False)
+            print(f"INFO: Unloading model {dropped}")
+        print(f"INFO: Loading model {name}...")
+        self.models[name] = whisper.load_model(name)
+        return self.models[name]
+
+class Job:
+    def __init__(self, client, model, audio, options):
+        self.client = client
+        self.model = model
+        self.audio = audio
+        self.options = options
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+class JobQueue:
+    """Per-client queues served round-robin."""
+
+    def __init__(self):
+        self.queues = OrderedDict()
+        self.condition = threading.Condition()
+
+    def put(self, job):
+        with self.condition:
+            self.queues.setdefault(job.client, deque()).append(job)
+            self.condition.notify()
+
+    def get(self):
+        with self.condition:
+            while not self.queues:
+                self.condition.wait()
+            # Take the oldest job of the first client and move that client to the back
+            client, jobs = next(iter(self.queues.items()))
+            job = jobs.popleft()
+            del self.queues[client]
+            if jobs:
+                self.queues[client] = jobs
+            return job
+
+    def __len__(self):
+        with self.condition:
+            return sum(len(jobs) for jobs in self.queues.values())
+
+def worker(jobs, models):
+    """Run queued transcriptions forever."""
+    while True:
+        job = jobs.get()
+        try:
+            model = models.get(job.model)
+            print(f"INFO: Transcribing {len(job.audio) / whisper.audio.SAMPLE_RATE:.1f}s for {job.client} with {job.model}...")
+            job.result = model.transcribe(job.audio, **job.options)["segments"]
+        except Exception as e:
+            job.error = str(e)
+        job.done.set()
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        message = read_message(self.rfile)
+        if message is None:
+            return
+        if message.get("cmd") == "ping":
+            send_message(self.request, {"ok": True, "models": list(self.server.models.models),
+                                        "queued": len(self.server.jobs)})
+            return
+        try:
+            # Audio is 16 kHz mono float32, as whisper.load_audio returns it
+            audio = np.frombuffer(read_payload(self.rfile, message["samples"] * 4), dtype=np.float32)
+            job = Job(message.get("client", self.client_address[0]), message["model"], audio,
+                      message.get("options", {}))
+        except (KeyError, ValueError, ConnectionError) as e:
+            send_message(self.request, {"error": f"Bad request: {e}"})
+            return
+        self.server.jobs.put(job)
+        job.done.wait()
+        if job.error is not None:
+            send_message(self.request, {"error": job.error})
+        else:
+            send_message(self.request, {"segments": job.result})
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper transcription server for makevideo.py")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="host:port to listen on")
+    parser.add_argument("--models", default="large-v3", help="Comma separated models to load on start")
+    parser.add_argument("--max_models", default=2, type=int, help="How many models to keep loaded")
+    args = parser.parse_args()
+
+    models = ModelPool(args.max_models)
+    for name in filter(None, args.models.split(",")):
+        models.get(name)
+    jobs = JobQueue()
+    threading.Thread(target=worker, args=(jobs, models), daemon=True).start()
+
+    with Server(parse_address(args.address), Handler) as server:
+        server.models = models
+        server.jobs = jobs
+        print(f"INFO: Listening on {args.address}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("INFO: Stopping server.")
+
+if __name__ == "__main__":
+    main()
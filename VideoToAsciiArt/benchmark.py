@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+#
+# Per-stage benchmark for convert.py on a generated video, so no assets are needed.
+#
+# Usage: python benchmark.py --grids 128x72,256x144,512x288 --workers 1,2,4 --output bench.json
+#
+import argparse
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import cv2
+import numpy as np
+
+import convert
+
+def make_video(path, width, height, fps, frames):
+    # Moving gradient with a bouncing circle and some text: busy enough to change every cell
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)
+    for i in range(frames):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:, :, 0] = ((x[None, :] + i * 4) % 256).astype(np.uint8)
+        frame[:, :, 1] = ((y[:, None] + i * 2) % 256).astype(np.uint8)
+        frame[:, :, 2] = 128
+        cx = int(width / 2 + width / 3 * np.sin(i / 10))
+        cv2.circle(frame, (cx, height // 2), height // 5, (255, 255, 255), -1)
+        cv2.putText(frame, f"frame {i}", (20, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 3)
+        writer.write(frame)
+    writer.release()
+
+def rate(count, seconds):
+    return round(count / seconds, 2) if seconds > 0 else None
+
+def bench_decode(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    started = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    elapsed = time.perf_counter() - started
+    cap.release()
+    return frames, {"frames": len(frames), "fps": rate(len(frames), elapsed)}
+
+def bench_preprocess(frames, settings):
+    started = time.perf_counter()
+    grids = [convert.to_grid(frame, settings) for frame in frames]
+    return grids, rate(len(frames), time.perf_counter() - started)
+
+def bench_render(grids, settings):
+    # First call builds the atlas; keep it out of the measurement
+    convert.render_grid(grids[0][0], grids[0][1], settings)
+    started = time.perf_counter()
+    for indices, colors in grids:
+        convert.render_grid(indices, colors, settings)
+    return rate(len(grids), time.perf_counter() - started)
+
+def bench_pickle(frame, settings):
+    # Cost of moving one input frame to a worker and one output frame back
+    output = np.zeros((settings.out_height, settings.out_width, 3), dtype=np.uint8)
+    rounds = 20
+    started = time.perf_counter()
+    for _ in range(rounds):
+        pickle.loads(pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL))
+        pickle.loads(pickle.dumps(output, protocol=pickle.HIGHEST_PROTOCOL))
+    elapsed = time.perf_counter() - started
+    return {"bytes_per_frame": frame.nbytes + output.nbytes, "frames_per_s": rate(rounds, elapsed)}
+
+def echo_frame(frame, out_shape):
+    # Worker that does no rendering, so the pool measures transport only
+    return np.zeros(out_shape, dtype=np.uint8)
+
+def bench_pool(frames, workers, settings, render=True):
+    window = 2 * workers
+    if render:
+        fn = partial(convert.process_frame, settings=settings)
+    else:
+        fn = partial(echo_frame, out_shape=(settings.out_height, settings.out_width, 3))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm up workers (process start, imports, atlas)
+        list(executor.map(fn, frames[:workers]))
+        started = time.perf_counter()
+        count = sum(1 for _ in convert.bounded_map(executor, fn, frames, window))
+    return rate(count, time.perf_counter() - started)
+
+def bench_encode(frames, settings, fps, preset):
+    if shutil.which("ffmpeg") is None:
+        return None
+    outputs = [np.ascontiguousarray(np.broadcast_to(frame[:1, :1], (settings.out_height, settings.out_width, 3)))
+               for frame in frames[:10]]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        writer = convert.FfmpegWriter(os.path.join(temp_dir, "encode.mp4"), fps,
+                                      (settings.out_width, settings.out_height), preset=preset)
+        started = time.perf_counter()
+        for i in range(len(frames)):
+            writer.write(outputs[i % len(outputs)])
+        writer.release()
+        return rate(len(frames), time.perf_counter() - started)
+
+def parse_grid(text):
+    cols, rows = text.lower().split("x")
+    return int(cols), int(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark convert.py stages on a synthetic video")
+    parser.add_argument("--frames", type=int, default=60, help="Frames in the synthetic video")
+    parser.add_argument("--size", type=str, default="1280x720", help="Synthetic video size")
+    parser.add_argument("--grids", type=str, default="128x72,256x144,512x288", help="Character grids to test")
+    parser.add_argument("--workers", type=str, default=",".join(sorted({"1", str(os.cpu_count() or 1)})),
+                        help="Worker counts to test")
+    parser.add_argument("--ramp", type=str, default="binary", help="Character ramp (see convert.py)")
+    parser.add_argument("--dither", choices=["none", "ordered", "floyd"], default="none")
+    parser.add_argument("--color", action="store_true")
+    parser.add_argument("--font", type=str, default=convert.FONT_PATH, help="Font file")
+    parser.add_argument("--pil", action="store_true", help="Also time the original PIL renderer (slow)")
+    parser.add_argument("--preset", type=str, default="veryfast", help="Encoder preset for the encode stage")
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    width, height = parse_grid(args.size)
+    worker_counts = [int(w) for w in args.workers.split(",")]
+    fps = 25
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "synthetic.mp4")
+        logging.info("Generating %d frames at %dx%d...", args.frames, width, height)
+        make_video(path, width, height, fps, args.frames)
+        frames, decode = bench_decode(path)
+    logging.info("decode: %s frames/s", decode["fps"])
+
+    results = {"video": {"size": args.size, "frames": len(frames)}, "decode": decode, "grids": []}
+    for grid in args.grids.split(","):
+        cols, rows = parse_grid(grid)
+        settings = convert.RenderSettings(cols, rows, font_path=args.font,
+                                          glyphs=convert.RAMPS.get(args.ramp, args.ramp),
+                                          dither=args.dither, color=args.color)
+        grids, preprocess = bench_preprocess(frames, settings)
+        entry = {"grid": grid, "preprocess_fps": preprocess, "render_fps": bench_render(grids, settings)}
+        if args.pil:
+            entry["render_pil_fps"] = bench_render(grids[:3], settings._replace(renderer="pil"))
+        entry["ipc_pickle"] = bench_pickle(frames[0], settings)
+        entry["encode_fps"] = bench_encode(frames, settings, fps, args.preset)
+        entry["pool"] = {}
+        for workers in worker_counts:
+            entry["pool"][workers] = {"transport_fps": bench_pool(frames, workers, settings, render=False),
+                                      "pipeline_fps": bench_pool(frames, workers, settings)}
+        logging.info("%s: preprocess %s, render %s, encode %s frames/s, pool %s", grid, entry["preprocess_fps"],
+                     entry["render_fps"], entry["encode_fps"], entry["pool"])
+        results["grids"].append(entry)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        logging.info("Results written to %s", args.output)
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
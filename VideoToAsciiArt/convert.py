@@ -1,55 +1,697 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
+import queue
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+from collections import deque, namedtuple
+from contextlib import ExitStack
+from functools import partial
 import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
-# Global settings
+# Default settings
 OUT_WIDTH, OUT_HEIGHT = 1920, 1080
 COLS, ROWS = 512, 288
-CELL_WIDTH = OUT_WIDTH // COLS
-CELL_HEIGHT = OUT_HEIGHT // ROWS
 FONT_PATH = "font.ttf"
 
-def process_frame(frame):
-    import cv2
-    import numpy as np
-    from PIL import Image, ImageDraw, ImageFont
+# Character ramps, from the glyph used for the darkest cells to the lightest
+RAMPS = {
+    "binary": "|-",
+    "classic": "@%#*+=-:. ",
+    "detailed": "$@B%8&WM#*oahkbdpqwmZO0QLCJUYXzcvunxrjft/\\|()1{}[]?-_+~<>i!lI;:,\"^`'. ",
+}
 
-    # Grayscale
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    # Lower res
-    small_gray = cv2.resize(gray, (COLS, ROWS), interpolation=cv2.INTER_AREA)
-    # Black x White
-    _, binary = cv2.threshold(small_gray, 127, 255, cv2.THRESH_BINARY)
-    
-    # White frame
-    ascii_img = Image.new("RGB", (OUT_WIDTH, OUT_HEIGHT), "white")
-    draw = ImageDraw.Draw(ascii_img)
-    # Load font
+# 4x4 Bayer matrix for ordered dithering
+BAYER_4 = np.array([[0, 8, 2, 10],
+                    [12, 4, 14, 6],
+                    [3, 11, 1, 9],
+                    [15, 7, 13, 5]])
+
+class RenderSettings(namedtuple("RenderSettings", "cols rows out_width out_height font_path glyphs dither color renderer",
+                                defaults=(COLS, ROWS, OUT_WIDTH, OUT_HEIGHT, FONT_PATH, RAMPS["binary"], "none", False, "atlas"))):
+    """Everything that changes how a frame is rendered.
+
+    Hashable and picklable, so it is sent to the workers as is and used as
+    the key for their font/atlas caches.
+    """
+    __slots__ = ()
+
+    @property
+    def cell_width(self):
+        return self.out_width // self.cols
+
+    @property
+    def cell_height(self):
+        return self.out_height // self.rows
+
+# Per-process cache of loaded fonts, glyph atlases and lookup tables
+_render_cache = {}
+
+def load_font(path, size):
     try:
-        font = ImageFont.truetype(FONT_PATH, CELL_HEIGHT)
+        return ImageFont.truetype(path, size)
     except IOError:
-        font = ImageFont.load_default()
-    
+        return ImageFont.load_default()
+
+def _div255(value):
+    # Same rounding PIL uses when it blends a text mask into the image
+    value = value + 128
+    return ((value >> 8) + value) >> 8
+
+def quantize(small_gray, levels, dither="none"):
+    """Map a grayscale grid to ramp indices (0 = darkest) using lookup tables."""
+    if dither == "floyd":
+        return floyd_steinberg(small_gray, levels)
+    key = ("lut", levels, dither)
+    if key not in _render_cache:
+        values = np.arange(256)
+        if dither == "ordered":
+            # One table per Bayer position
+            thresholds = (BAYER_4.ravel() + 0.5) / 16
+            lut = np.floor(values[None, :] * (levels - 1) / 255 + thresholds[:, None])
+        else:
+            # Equal-width bands; with two levels this is the old "> 127" threshold
+            lut = values[None, :] * levels // 256
+        _render_cache[key] = np.clip(lut, 0, levels - 1).astype(np.intp)
+    lut = _render_cache[key]
+    if dither != "ordered":
+        return lut[0][small_gray]
+    key = ("bayer", small_gray.shape)
+    if key not in _render_cache:
+        rows, cols = small_gray.shape
+        _render_cache[key] = (np.arange(rows)[:, None] % 4) * 4 + np.arange(cols)[None, :] % 4
+    return lut[_render_cache[key], small_gray]
+
+def floyd_steinberg(small_gray, levels):
+    # Error diffusion, vectorized over anti-diagonal wavefronts: every cell with
+    # c + 2r == k only depends on cells from earlier wavefronts. The grid is
+    # stored skewed (cell (r, c) at [c + 2r + 1, r]) so each wavefront is one
+    # contiguous row and its neighbours are plain slices of the next rows.
+    rows, cols = small_gray.shape
+    waves = cols + 2 * rows + 2
+    key = ("skew", rows, cols)
+    if key not in _render_cache:
+        r, c = np.indices((rows, cols))
+        valid = np.zeros((waves, rows), dtype=np.float32)
+        valid[c + 2 * r + 1, r] = 1
+        _render_cache[key] = (c + 2 * r + 1, r, valid)
+    skew_k, skew_r, valid = _render_cache[key]
+    values = np.zeros((waves, rows + 1), dtype=np.float32)
+    values[skew_k, skew_r] = small_gray
+    quantized = np.zeros((waves, rows), dtype=np.float32)
+    scale = np.float32((levels - 1) / 255)
+    for k in range(1, waves - 3):
+        value = values[k, :rows]
+        level = np.clip(np.rint(value * scale), 0, levels - 1)
+        error = (value - level / scale) * valid[k]
+        quantized[k] = level
+        values[k + 1, :rows] += error * np.float32(7 / 16)
+        values[k + 1, 1:] += error * np.float32(3 / 16)
+        values[k + 2, 1:] += error * np.float32(5 / 16)
+        values[k + 3, 1:] += error * np.float32(1 / 16)
+    return quantized[skew_k, skew_r].astype(np.intp)
+
+class GlyphAtlas:
+    """Rasterizes every glyph once and builds whole frames with array gathers.
+
+    The output is pixel-identical to drawing each cell with ImageDraw.text,
+    including glyphs that bleed into neighbouring cells.
+    """
+
+    def __init__(self, font, glyphs, cell_width, cell_height, out_width, out_height):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.out_width = out_width
+        self.out_height = out_height
+        self.blank = len(glyphs)
+
+        # Render each glyph alone on a white canvas with a generous margin
+        probe = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+        boxes = [probe.textbbox((0, 0), g, font=font) for g in glyphs]
+        reach = max(max(abs(v) for v in box) for box in boxes)
+        margin_x = reach // cell_width + 2
+        margin_y = reach // cell_height + 2
+        span_x = 2 * margin_x + 1
+        span_y = 2 * margin_y + 1
+        masks = np.zeros((len(glyphs) + 1, span_y * cell_height, span_x * cell_width), dtype=np.uint8)
+        for i, g in enumerate(glyphs):
+            canvas = Image.new("RGB", (span_x * cell_width, span_y * cell_height), "white")
+            ImageDraw.Draw(canvas).text((margin_x * cell_width, margin_y * cell_height), g, font=font, fill="black")
+            # On white, a black glyph leaves exactly 255 - mask
+            masks[i] = 255 - np.array(canvas)[:, :, 0]
+
+        # Split masks into per-cell tiles: (glyph, cell_y, cell_x, h, w)
+        tiles = masks.reshape(len(glyphs) + 1, span_y, cell_height, span_x, cell_width).transpose(0, 1, 3, 2, 4)
+        used = tiles.any(axis=(0, 3, 4))
+        ys = np.nonzero(used.any(axis=1))[0]
+        xs = np.nonzero(used.any(axis=0))[0]
+        if len(ys) == 0:
+            ys, xs = np.array([margin_y]), np.array([margin_x])
+        y0, y1 = min(ys[0], margin_y), max(ys[-1], margin_y)
+        x0, x1 = min(xs[0], margin_x), max(xs[-1], margin_x)
+        # Offsets relative to the cell a glyph is drawn in
+        self.reach_up = margin_y - y0
+        self.reach_down = y1 - margin_y
+        self.reach_left = margin_x - x0
+        self.reach_right = x1 - margin_x
+        self.tiles = np.ascontiguousarray(tiles[:, y0:y1 + 1, x0:x1 + 1])
+
+        # Blend passes in the order PIL would apply them for a given pixel
+        self.passes = []
+        for oy in range(self.reach_down, -self.reach_up - 1, -1):
+            for ox in range(self.reach_right, -self.reach_left - 1, -1):
+                tile = self.tiles[:, oy + self.reach_up, ox + self.reach_left]
+                if not tile.any():
+                    continue
+                # Only blend the part of the cell this offset can reach
+                ys = np.nonzero(tile.any(axis=(0, 2)))[0]
+                xs = np.nonzero(tile.any(axis=(0, 1)))[0]
+                y0, y1, x0, x1 = int(ys[0]), int(ys[-1]) + 1, int(xs[0]), int(xs[-1]) + 1
+                keep = (255 - tile[:, y0:y1, x0:x1]).astype(np.uint16)
+                self.passes.append((oy, ox, (slice(y0, y1), slice(x0, x1)), keep))
+        self.simple = len(self.passes) == 1 and self.passes[0][:2] == (0, 0)
+        # Each glyph's own cell, and which glyphs reach into the cells around them
+        self.atlas = 255 - self.tiles[:, self.reach_up, self.reach_left]
+        self.bleeds = [(oy, ox, (keep < 255).any(axis=(1, 2))) for oy, ox, _, keep in self.passes if oy or ox]
+
+    def _grid(self, indices, colors=None):
+        # Glyph indices on a canvas covering the whole output, padded so every
+        # shifted view of the sources stays in bounds
+        rows, cols = indices.shape
+        grid_rows = max(rows, -(-self.out_height // self.cell_height))
+        grid_cols = max(cols, -(-self.out_width // self.cell_width))
+        grid = np.full((grid_rows + self.reach_up + self.reach_down,
+                        grid_cols + self.reach_left + self.reach_right), self.blank, dtype=np.intp)
+        grid[self.reach_down:self.reach_down + rows, self.reach_right:self.reach_right + cols] = indices
+        if colors is not None:
+            # Same layout as the glyph grid, so a pass reads the colour of the cell that drew it
+            padded = np.zeros(grid.shape + (3,), dtype=np.uint8)
+            padded[self.reach_down:self.reach_down + rows, self.reach_right:self.reach_right + cols] = colors
+            colors = padded
+        return grid, colors, grid_rows, grid_cols
+
+    def _pixels(self, grid, colors, r0, r1, c0, c1):
+        # Pixels for canvas cells [r0, r1) x [c0, c1): grayscale, or BGR with colors
+        if colors is not None:
+            return self._color_pixels(grid, colors, r0, r1, c0, c1)
+        if self.simple:
+            cells = self.atlas[grid[r0:r1, c0:c1]]
+        else:
+            cells = np.full((r1 - r0, c1 - c0, self.cell_height, self.cell_width), 255, dtype=np.uint16)
+            for oy, ox, (ys, xs), keep in self.passes:
+                top = self.reach_down - oy + r0
+                left = self.reach_right - ox + c0
+                region = cells[:, :, ys, xs]
+                region *= keep[grid[top:top + r1 - r0, left:left + c1 - c0]]
+                cells[:, :, ys, xs] = _div255(region)
+            cells = cells.astype(np.uint8)
+        gray = cells.transpose(0, 2, 1, 3).reshape((r1 - r0) * self.cell_height, (c1 - c0) * self.cell_width)
+        return self._crop(gray, r0, c0)
+
+    def _color_pixels(self, grid, colors, r0, r1, c0, c1):
+        rows, cols = r1 - r0, c1 - c0
+        top, left = self.reach_down + r0, self.reach_right + c0
+        # A cell only its own glyph draws into is one blend of that glyph's ink over white:
+        # ink + (255 - ink) * gray / 255, rounded the way PIL does
+        gray = self.atlas[grid[top:top + rows, left:left + cols]]
+        gray = gray.transpose(0, 2, 1, 3).reshape(rows * self.cell_height, cols * self.cell_width)
+        ink = colors[top:top + rows, left:left + cols]
+        ink = np.repeat(np.repeat(ink, self.cell_height, axis=0), self.cell_width, axis=1)
+        pixels = cv2.add(ink, cv2.multiply(255 - ink, cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), scale=1 / 255))
+
+        # Where a neighbour's glyph reaches in, replay every pass with the ink of the cell that
+        # drew it, as PIL does: (old * keep + ink * mask) / 255. Cells are (cell, channel, y, x).
+        bled = np.zeros((rows, cols), dtype=bool)
+        for oy, ox, reaches in self.bleeds:
+            bled |= reaches[grid[top - oy:top - oy + rows, left - ox:left - ox + cols]]
+        ri, ci = np.nonzero(bled)
+        if len(ri):
+            cells = np.full((len(ri), 3, self.cell_height, self.cell_width), 255, dtype=np.uint16)
+            for oy, ox, (ys, xs), keep in self.passes:
+                src_r, src_c = top - oy + ri, left - ox + ci
+                keep = keep[grid[src_r, src_c]][:, None]
+                ink = colors[src_r, src_c, :, None, None].astype(np.uint16)
+                cells[..., ys, xs] = _div255(cells[..., ys, xs] * keep + ink * (255 - keep))
+            pixels.reshape(rows, self.cell_height, cols, self.cell_width, 3)[ri, :, ci] = cells.transpose(0, 2, 3, 1)
+        return self._crop(pixels, r0, c0)
+
+    def _crop(self, pixels, r0, c0):
+        # Drop the padding cells past the output edge
+        return pixels[:max(0, self.out_height - r0 * self.cell_height), :max(0, self.out_width - c0 * self.cell_width)]
+
+    def render(self, indices, colors=None, out=None):
+        """Build a BGR frame from a grid of glyph indices (and per-cell BGR colors)."""
+        grid, colors, grid_rows, grid_cols = self._grid(indices, colors)
+        pixels = self._pixels(grid, colors, 0, grid_rows, 0, grid_cols)
+        if pixels.ndim == 2:
+            if out is None:
+                return cv2.cvtColor(pixels, cv2.COLOR_GRAY2BGR)
+            pixels = pixels[:, :, None]
+        if out is None:
+            return pixels
+        out[...] = pixels
+        return out
+
+    def render_changes(self, indices, changed, colors=None, tile=32, max_fraction=0.5):
+        """Render only the tiles affected by the changed cells.
+
+        Returns a list of (y, x, block) patches for the previous output
+        frame, or None when so much changed that a full render is cheaper.
+        """
+        if not changed.any():
+            return []
+        grid, colors, grid_rows, grid_cols = self._grid(indices, colors)
+        tile = max(tile, self.reach_up + 1, self.reach_down + 1, self.reach_left + 1, self.reach_right + 1)
+        tiles_y = -(-grid_rows // tile)
+        tiles_x = -(-grid_cols // tile)
+        padded = np.zeros((tiles_y * tile, tiles_x * tile), dtype=bool)
+        padded[:changed.shape[0], :changed.shape[1]] = changed
+        dirty = padded.reshape(tiles_y, tile, tiles_x, tile).any(axis=(1, 3))
+        if not self.simple:
+            # Glyphs bleed at most one tile into their neighbours
+            grown = np.pad(dirty, 1)
+            dirty = (grown[1:-1, 1:-1] | grown[:-2, 1:-1] | grown[2:, 1:-1]
+                     | grown[1:-1, :-2] | grown[1:-1, 2:])
+            grown = np.pad(dirty, 1)
+            dirty |= grown[:-2, :-2] | grown[:-2, 2:] | grown[2:, :-2] | grown[2:, 2:]
+        if dirty.mean() > max_fraction:
+            return None
+
+        patches = []
+        for ty, tx in zip(*np.nonzero(dirty)):
+            r0, c0 = ty * tile, tx * tile
+            block = self._pixels(grid, colors, r0, min(r0 + tile, grid_rows), c0, min(c0 + tile, grid_cols))
+            if block.size:
+                patches.append((r0 * self.cell_height, c0 * self.cell_width, block))
+        return patches
+
+def get_font(settings):
+    key = ("font", settings.font_path, settings.cell_height)
+    if key not in _render_cache:
+        _render_cache[key] = load_font(settings.font_path, settings.cell_height)
+    return _render_cache[key]
+
+def get_atlas(settings):
+    key = ("atlas", settings.font_path, settings.glyphs, settings.cell_width, settings.cell_height,
+           settings.out_width, settings.out_height)
+    if key not in _render_cache:
+        _render_cache[key] = GlyphAtlas(get_font(settings), settings.glyphs, settings.cell_width,
+                                        settings.cell_height, settings.out_width, settings.out_height)
+    return _render_cache[key]
+
+def render_pil(indices, settings, colors=None):
+    # Original renderer: one ImageDraw.text call per cell
+    ascii_img = Image.new("RGB", (settings.out_width, settings.out_height), "white")
+    draw = ImageDraw.Draw(ascii_img)
+    font = get_font(settings)
+
     # Create grid
-    for r in range(ROWS):
-        for c in range(COLS):
-            char = "|" if binary[r, c] == 0 else "-"
-            x = c * CELL_WIDTH
-            y = r * CELL_HEIGHT
-            draw.text((x, y), char, font=font, fill="black")
-    
+    for r in range(settings.rows):
+        for c in range(settings.cols):
+            char = settings.glyphs[indices[r, c]]
+            x = c * settings.cell_width
+            y = r * settings.cell_height
+            fill = "black" if colors is None else tuple(int(v) for v in colors[r, c][::-1])
+            draw.text((x, y), char, font=font, fill=fill)
+
     # PIL pic ready
     ascii_frame = np.array(ascii_img)
     ascii_frame = cv2.cvtColor(ascii_frame, cv2.COLOR_RGB2BGR)
     return ascii_frame
 
-def extract_and_merge_audio(input_video, start_time, end_time, video_only, final_output):
+def to_grid(frame, settings):
+    """Return ramp indices per cell and, in color mode, the per-cell BGR colors."""
+    # Grayscale
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    # Lower res
+    small_gray = cv2.resize(gray, (settings.cols, settings.rows), interpolation=cv2.INTER_AREA)
+    # Gray levels to glyphs
+    indices = quantize(small_gray, len(settings.glyphs), settings.dither)
+    colors = None
+    if settings.color:
+        colors = cv2.resize(frame, (settings.cols, settings.rows), interpolation=cv2.INTER_AREA)
+    return indices, colors
+
+def render_grid(indices, colors, settings, out=None):
+    if settings.renderer == "pil":
+        ascii_frame = render_pil(indices, settings, colors)
+        if out is None:
+            return ascii_frame
+        out[...] = ascii_frame
+        return out
+    return get_atlas(settings).render(indices, colors, out=out)
+
+def process_frame(frame, settings=RenderSettings(), out=None, timings=None):
+    started = time.perf_counter()
+    indices, colors = to_grid(frame, settings)
+    converted = time.perf_counter()
+    result = render_grid(indices, colors, settings, out=out)
+    if timings is not None:
+        timings["preprocess"] = timings.get("preprocess", 0) + converted - started
+        timings["render"] = timings.get("render", 0) + time.perf_counter() - converted
+    return result
+
+def process_chunk(frames, settings=RenderSettings(), tile=32, timings=None):
+    """Render consecutive frames, sending only what changed between them.
+
+    Returns one update per frame: ("frame", image) for a full render,
+    ("same", None) when the grid did not change, or ("patch", patches)
+    with tiles to paste over the previous output frame.
+    """
+    updates = []
+    previous = previous_colors = None
+    preprocess = 0
+    started = time.perf_counter()
+    for frame in frames:
+        converting = time.perf_counter()
+        indices, colors = to_grid(frame, settings)
+        preprocess += time.perf_counter() - converting
+        patches = None
+        if previous is not None:
+            changed = indices != previous
+            if colors is not None:
+                changed |= (colors != previous_colors).any(axis=2)
+            if not changed.any():
+                updates.append(("same", None))
+                continue
+            if settings.renderer != "pil":
+                patches = get_atlas(settings).render_changes(indices, changed, colors, tile=tile)
+        if patches is None:
+            updates.append(("frame", render_grid(indices, colors, settings)))
+        else:
+            updates.append(("patch", patches))
+        previous, previous_colors = indices, colors
+    if timings is not None:
+        timings["preprocess"] = timings.get("preprocess", 0) + preprocess
+        timings["render"] = timings.get("render", 0) + time.perf_counter() - started - preprocess
+    return updates
+
+def apply_updates(chunks, counts=None):
+    """Turn process_chunk results back into one output frame per input frame.
+
+    The yielded frame is patched in place, so consume it before the next one.
+    """
+    current = None
+    for updates in chunks:
+        for kind, data in updates:
+            if kind == "frame":
+                current = data
+            elif kind == "patch":
+                for y, x, block in data:
+                    if block.ndim == 2:
+                        block = block[:, :, None]
+                    current[y:y + block.shape[0], x:x + block.shape[1]] = block
+            if counts is not None:
+                counts[kind] = counts.get(kind, 0) + 1
+            yield current
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class FrameRing:
+    """A fixed number of same-sized frame slots in shared memory.
+
+    The parent creates the ring, pool workers attach to it by name, and
+    only slot indices are sent between processes.
+    """
+
+    def __init__(self, slots, shape, name=None):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.owner = name is None
+        size = slots * int(np.prod(self.shape))
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.array = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        del self.array
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+# Rings attached in this worker process
+_rings = {}
+
+def attach_rings(in_name, in_slots, in_shape, out_name, out_slots, out_shape):
+    _rings["in"] = FrameRing(in_slots, in_shape, in_name)
+    _rings["out"] = FrameRing(out_slots, out_shape, out_name)
+
+def process_slot(slot, settings=RenderSettings(), timings=None):
+    # Render input slot into the output slot with the same index
+    process_frame(_rings["in"].array[slot], settings, out=_rings["out"].array[slot], timings=timings)
+    return slot
+
+def render_shared(cap, end_time, frame_shape, workers, window, settings=RenderSettings(), stats=None):
+    """Decode, render and yield output frames through shared-memory rings.
+
+    Each yielded frame is a view into the output ring and is only valid
+    until the next frame is requested.
+    """
+    in_ring = FrameRing(window, frame_shape)
+    out_ring = FrameRing(window, (settings.out_height, settings.out_width, 3))
+    free_slots = queue.Queue()
+    for slot in range(window):
+        free_slots.put(slot)
+    stop = threading.Event()
+
+    def decode():
+        # Reader thread: take a free slot, decode straight into it
+        while not stop.is_set():
+            slot = free_slots.get()
+            if slot is None:
+                return
+            pos_sec = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if pos_sec > end_time:
+                return
+            decoding = time.perf_counter()
+            ret, frame = cap.read(in_ring.array[slot])
+            if stats is not None:
+                stats.add("decode", time.perf_counter() - decoding)
+            if not ret:
+                return
+            if frame.shape != frame_shape:
+                logging.error("Frame size changed mid-stream: %s", frame.shape)
+                return
+            if frame.ctypes.data != in_ring.array[slot].ctypes.data:
+                in_ring.array[slot] = frame
+            yield slot
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=attach_rings,
+                                   initargs=(in_ring.name, window, frame_shape,
+                                             out_ring.name, window, out_ring.shape))
+    try:
+        render = partial(process_slot, settings=settings)
+        if stats is not None:
+            render = partial(timed_call, render)
+        for slot in bounded_map(executor, render, prefetch(decode(), window, stats), window, stats):
+            yield out_ring.array[slot]
+            free_slots.put(slot)
+    finally:
+        stop.set()
+        free_slots.put(None)
+        executor.shutdown()
+        in_ring.close()
+        out_ring.close()
+
+def read_frames(cap, end_time, stats=None):
+    # Decode frames until end_time, one at a time
+    while True:
+        pos_sec = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if pos_sec > end_time:
+            break
+        decoding = time.perf_counter()
+        ret, frame = cap.read()
+        if stats is not None:
+            stats.add("decode", time.perf_counter() - decoding)
+        if not ret:
+            break
+        yield frame
+
+def prefetch(iterable, size, stats=None):
+    """Run an iterator in a background thread, keeping at most size items ready."""
+    buffer = queue.Queue(maxsize=max(1, size))
+    done = object()
+    errors = []
+
+    def produce():
+        try:
+            for item in iterable:
+                buffer.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            buffer.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        if stats is not None:
+            stats.sample("decoded_ready", buffer.qsize())
+        item = buffer.get()
+        if item is done:
+            break
+        yield item
+    if errors:
+        raise errors[0]
+
+class StageStats:
+    """Per-stage timings and queue depths for --stats.
+
+    Stages are wall-clock seconds summed over all frames (worker stages are
+    summed over all workers). "ipc" is the time a task spent between being
+    submitted and a worker starting it, plus between the worker finishing
+    and its result arriving back: pickling, pipes and pool queueing.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self.depths = {}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def add(self, stage, seconds, count=1):
+        with self.lock:
+            self.totals[stage] = self.totals.get(stage, 0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + count
+
+    def sample(self, queue_name, depth):
+        with self.lock:
+            self.depths.setdefault(queue_name, []).append(depth)
+
+    def track(self, future):
+        # Wall clock, because the worker reports its own time.time() stamps
+        submitted = time.time()
+        future.add_done_callback(lambda f: setattr(f, "stage_times", (submitted, time.time())))
+
+    def collect(self, future, timings):
+        submitted, received = future.stage_times
+        for stage in ("preprocess", "render"):
+            if stage in timings:
+                self.add(stage, timings[stage])
+        self.add("ipc", max(0, timings["started"] - submitted) + max(0, received - timings["finished"]))
+
+    def report(self, frames, **extra):
+        elapsed = time.perf_counter() - self.started
+        stages = {stage: {"total_s": round(total, 4), "count": self.counts[stage],
+                          "avg_ms": round(1000 * total / max(1, self.counts[stage]), 3)}
+                  for stage, total in self.totals.items()}
+        queues = {name: {"mean": round(float(np.mean(d)), 2), "max": int(max(d))}
+                  for name, d in self.depths.items() if d}
+        report = {"frames": frames, "wall_s": round(elapsed, 3),
+                  "fps": round(frames / elapsed, 3) if elapsed else 0,
+                  "stages": stages, "queues": queues}
+        report.update(extra)
+        return report
+
+def timed_call(fn, item):
+    # Runs fn in a worker and reports where the time went alongside the result
+    timings = {"started": time.time()}
+    result = fn(item, timings=timings)
+    timings["finished"] = time.time()
+    return result, timings
+
+def bounded_map(executor, fn, iterable, window, stats=None):
+    """Like executor.map, but never has more than window items in flight.
+
+    Results are yielded in input order as soon as the oldest one is ready,
+    so memory stays proportional to the window instead of the input length.
+    With stats, fn must return (result, timings) as timed_call does.
+    """
+    def take(future):
+        if stats is None:
+            return future.result()
+        waiting = time.perf_counter()
+        result, timings = future.result()
+        stats.add("result_wait", time.perf_counter() - waiting)
+        stats.collect(future, timings)
+        return result
+
+    pending = deque()
+    for item in iterable:
+        future = executor.submit(fn, item)
+        if stats is not None:
+            stats.track(future)
+            stats.sample("in_flight", len(pending) + 1)
+        pending.append(future)
+        if len(pending) >= window:
+            yield take(pending.popleft())
+    while pending:
+        yield take(pending.popleft())
+
+class FfmpegWriter:
+    """Pipes raw BGR frames into a single ffmpeg process that also muxes the audio.
+
+    The audio is taken straight from the [start_time, end_time] range of the
+    original input, so there is one encode pass and no temp files.
+    """
+
+    def __init__(self, output, fps, size, input_video=None, start_time=0, end_time=None,
+                 encoder="libx264", preset="slow", crf=23, threads=0):
+        width, height = size
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}",
+            "-r", str(fps),
+            "-i", "-",
+        ]
+        if input_video is not None:
+            cmd += ["-ss", str(start_time)]
+            if end_time is not None:
+                cmd += ["-t", str(end_time - start_time)]
+            cmd += ["-i", input_video, "-map", "0:v", "-map", "1:a?", "-c:a", "aac"]
+        cmd += [
+            "-c:v", encoder,
+            "-preset", preset,
+            "-crf", str(crf),
+            "-threads", str(threads),
+            "-pix_fmt", "yuv420p",
+            output
+        ]
+        self.cmd = cmd
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        try:
+            self.proc.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            # ffmpeg quit early (bad encoder or preset, unwritable output...), report it like release() does
+            self.proc.wait()
+            raise subprocess.CalledProcessError(self.proc.returncode, self.cmd)
+
+    def release(self):
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self.proc.wait() != 0:
+            raise subprocess.CalledProcessError(self.proc.returncode, self.cmd)
+
+def extract_and_merge_audio(input_video, start_time, end_time, video_only, final_output,
+                            encoder="libx264", preset="slow", crf=23, threads=0):
     temp_audio = "temp_audio.aac"
     logging.info("Extracting audio from the original file...")
     # Extract audio
@@ -69,9 +711,10 @@ def extract_and_merge_audio(input_video, start_time, end_time, video_only, final
         "ffmpeg", "-y",
         "-i", video_only,
         "-i", temp_audio,
-        "-c:v", "libx264",
-        "-preset", "slow",
-        "-crf", "23",
+        "-c:v", encoder,
+        "-preset", preset,
+        "-crf", str(crf),
+        "-threads", str(threads),
         "-c:a", "aac",
         final_output
     ], check=True)
@@ -80,6 +723,538 @@ def extract_and_merge_audio(input_video, start_time, end_time, video_only, final
     os.remove(temp_audio)
     logging.info("Audio + Video merged successfully.")
 
+def probe_keyframes(input_video):
+    """Keyframe timestamps of the first video stream, or None without ffprobe."""
+    try:
+        result = subprocess.run([
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            input_video
+        ], check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    times = []
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) >= 2 and "K" in fields[1] and fields[0] not in ("", "N/A"):
+            times.append(float(fields[0]))
+    return sorted(times)
+
+def first_frame_at(start_time, fps):
+    # The frame a CAP_PROP_POS_MSEC seek lands on: the nearest one, halves round up
+    return int(start_time * fps + 0.5)
+
+def plan_segments(first_frame, frame_count, segments, fps, keyframes=None):
+    """Split frames [first_frame, first_frame + frame_count) into (start, count) segments.
+
+    Boundaries are snapped to the nearest keyframe when one is within half a
+    segment, so each worker's seek lands on a keyframe instead of decoding
+    from the previous one.
+    """
+    end_frame = first_frame + frame_count
+    segments = max(1, min(segments, frame_count))
+    targets = np.linspace(first_frame, end_frame, segments + 1)[1:-1]
+    key_frames = []
+    if keyframes:
+        key_frames = np.array(sorted({int(round(t * fps)) for t in keyframes
+                                      if first_frame < round(t * fps) < end_frame}))
+    reach = frame_count / segments / 2
+    bounds = set()
+    for target in targets:
+        bound = int(round(target))
+        if len(key_frames):
+            nearest = key_frames[np.abs(key_frames - target).argmin()]
+            if abs(nearest - target) <= reach:
+                bound = int(nearest)
+        bounds.add(bound)
+    bounds = [first_frame] + sorted(b for b in bounds if first_frame < b < end_frame) + [end_frame]
+    return [(a, b - a) for a, b in zip(bounds, bounds[1:])]
+
+def render_segment(input_video, first_frame, frame_count, output, fps, settings=RenderSettings(),
+                   encode=None, incremental=False, chunk_frames=24, tile=32):
+    """Decode, render and encode one segment with its own capture and encoder."""
+    cap = cv2.VideoCapture(input_video)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file {input_video}")
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame)
+
+    def frames():
+        for _ in range(frame_count):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+
+    writer = FfmpegWriter(output, fps, (settings.out_width, settings.out_height), **(encode or {}))
+    written = 0
+    try:
+        if incremental:
+            results = apply_updates(process_chunk(chunk, settings, tile) for chunk in batched(frames(), chunk_frames))
+        else:
+            results = (process_frame(frame, settings) for frame in frames())
+        for ascii_frame in results:
+            writer.write(ascii_frame)
+            written += 1
+    finally:
+        cap.release()
+        writer.release()
+    return written
+
+def concat_segments(segment_files, input_video, start_time, end_time, final_output):
+    # Join the segments without re-encoding and mux the audio once. The list gets a
+    # directory of its own, so jobs sharing the chunk cache never overwrite each other's.
+    with tempfile.TemporaryDirectory() as temp_dir:
+        list_file = os.path.join(temp_dir, "segments.txt")
+        with open(list_file, "w", encoding="utf-8") as f:
+            for path in segment_files:
+                f.write("file '" + os.path.abspath(path).replace("'", "'\\''") + "'\n")
+        subprocess.run([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0",
+            "-i", list_file,
+            "-ss", str(start_time),
+            "-t", str(end_time - start_time),
+            "-i", input_video,
+            "-map", "0:v", "-map", "1:a?",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            final_output
+        ], check=True)
+
+def convert_segmented(input_video, start_time, end_time, fps, frame_count, final_output, workers,
+                      segments, settings=RenderSettings(), encode=None, incremental=False,
+                      chunk_frames=24, tile=32):
+    """Render keyframe-aligned segments in parallel, each with its own decoder."""
+    first_frame = first_frame_at(start_time, fps)
+    keyframes = probe_keyframes(input_video)
+    if keyframes is None:
+        logging.info("ffprobe not available, splitting segments evenly")
+    plan = plan_segments(first_frame, frame_count, segments, fps, keyframes)
+    logging.info("Rendering %d segments with %d workers...", len(plan), workers)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(final_output))) as temp_dir:
+        segment_files = [os.path.join(temp_dir, f"segment_{i:05d}.mp4") for i in range(len(plan))]
+        written = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render_segment, input_video, first, count, path, fps, settings,
+                                       encode, incremental, chunk_frames, tile)
+                       for (first, count), path in zip(plan, segment_files)]
+            for i, future in enumerate(futures, start=1):
+                written += future.result()
+                logging.info(" %d/%d segments ready (%d frames)", i, len(plan), written)
+        logging.info("Joining segments and muxing audio...")
+        concat_segments(segment_files, input_video, start_time, end_time, final_output)
+    return written
+
+def file_hash(path, cache_dir):
+    """SHA-256 of a file's contents, remembered per (path, size, mtime)."""
+    stat = os.stat(path)
+    ident = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    index_path = os.path.join(cache_dir, "hashes.json")
+    index = {}
+    if os.path.isfile(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    if ident not in index:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        index[ident] = digest.hexdigest()
+        os.makedirs(cache_dir, exist_ok=True)
+        # Own temp name, so jobs sharing the cache never write the same file
+        fd, temp_path = tempfile.mkstemp(prefix="hashes.", suffix=".tmp", dir=cache_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(temp_path, index_path)
+    return index[ident]
+
+def chunk_key(input_hash, first_frame, frame_count, fps, settings, encode):
+    # Everything that changes the encoded pixels; incremental mode only patches
+    # what a full render would draw, so it is left out. The renderer stays in,
+    # so a --renderer pil run never trusts chunks the atlas drew.
+    font = settings.font_path
+    if os.path.isfile(font):
+        stat = os.stat(font)
+        font = f"{os.path.abspath(font)}|{stat.st_size}|{stat.st_mtime_ns}"
+    fields = [input_hash, first_frame, frame_count, fps, list(settings._replace(font_path=font)),
+              sorted((encode or {}).items())]
+    return hashlib.sha256(json.dumps(fields).encode("utf-8")).hexdigest()[:32]
+
+def plan_chunks(first_frame, frame_count, chunk_frames):
+    # Chunks sit on a fixed grid of absolute frame numbers, so jobs with
+    # overlapping ranges produce the same chunks
+    end_frame = first_frame + frame_count
+    bounds = [first_frame] + list(range((first_frame // chunk_frames + 1) * chunk_frames, end_frame, chunk_frames))
+    bounds.append(end_frame)
+    return [(a, b - a) for a, b in zip(bounds, bounds[1:])]
+
+def render_chunk(input_video, first_frame, frame_count, path, fps, settings=RenderSettings(),
+                 encode=None, incremental=False, chunk_frames=24, tile=32):
+    # Render to a temp name of our own first, so an interrupted job never leaves a broken chunk
+    # and jobs sharing the cache never write the same file. cache_prune clears stale .part.mp4s.
+    fd, part = tempfile.mkstemp(prefix=os.path.basename(path)[:-len(".mp4")] + ".",
+                                suffix=".part.mp4", dir=os.path.dirname(path))
+    os.close(fd)
+    try:
+        written = render_segment(input_video, first_frame, frame_count, part, fps, settings, encode,
+                                 incremental, chunk_frames, tile)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    try:
+        os.replace(part, path)
+    except FileNotFoundError:
+        # Lost a race with another job's prune; fine as long as some job finished the chunk
+        if not os.path.isfile(path):
+            raise
+    return written
+
+def convert_cached(input_video, start_time, end_time, fps, frame_count, final_output, workers, cache_dir,
+                   chunk_seconds, settings=RenderSettings(), encode=None, incremental=False,
+                   chunk_frames=24, tile=32):
+    """Render through the on-disk chunk cache, reusing every finished chunk."""
+    chunk_dir = os.path.join(cache_dir, "chunks")
+    os.makedirs(chunk_dir, exist_ok=True)
+    logging.info("Hashing %s...", input_video)
+    input_hash = file_hash(input_video, cache_dir)
+
+    first_frame = first_frame_at(start_time, fps)
+    plan = plan_chunks(first_frame, frame_count, max(1, int(round(chunk_seconds * fps))))
+    paths = []
+    missing = []
+    for first, count in plan:
+        key = chunk_key(input_hash, first, count, fps, settings, encode)
+        path = os.path.join(chunk_dir, key + ".mp4")
+        paths.append(path)
+        if os.path.isfile(path):
+            # Refresh mtime so pruning by age keeps recently used chunks
+            os.utime(path)
+        else:
+            missing.append((first, count, path, key))
+    logging.info("Cache: %d/%d chunks already rendered", len(plan) - len(missing), len(plan))
+
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(render_chunk, input_video, first, count, path, fps, settings, encode,
+                                       incremental, chunk_frames, tile): (first, count, path, key)
+                       for first, count, path, key in missing}
+            for i, future in enumerate(as_completed(futures), start=1):
+                future.result()
+                first, count, path, key = futures[future]
+                with open(os.path.join(chunk_dir, key + ".json"), "w", encoding="utf-8") as f:
+                    json.dump({"input": os.path.abspath(input_video), "input_hash": input_hash,
+                               "first_frame": first, "frame_count": count, "fps": fps,
+                               "settings": settings._asdict(), "encode": encode}, f)
+                logging.info(" %d/%d missing chunks ready", i, len(missing))
+
+    logging.info("Joining chunks and muxing audio...")
+    concat_segments(paths, input_video, start_time, end_time, final_output)
+
+def cache_entries(cache_dir):
+    # (path, size, mtime) of every finished chunk, oldest first
+    chunk_dir = os.path.join(cache_dir, "chunks")
+    entries = []
+    if os.path.isdir(chunk_dir):
+        for name in os.listdir(chunk_dir):
+            if name.endswith(".mp4") and not name.endswith(".part.mp4"):
+                stat = os.stat(os.path.join(chunk_dir, name))
+                entries.append((os.path.join(chunk_dir, name), stat.st_size, stat.st_mtime))
+    return sorted(entries, key=lambda e: e[2])
+
+def cache_info(cache_dir):
+    entries = cache_entries(cache_dir)
+    total = sum(size for _, size, _ in entries)
+    logging.info("Cache %s: %d chunks, %.1f MB", cache_dir, len(entries), total / 1e6)
+    if entries:
+        logging.info("Oldest chunk used %s, newest %s", time.ctime(entries[0][2]), time.ctime(entries[-1][2]))
+    inputs = {}
+    for path, size, _ in entries:
+        meta_path = path[:-len(".mp4")] + ".json"
+        name = "?"
+        if os.path.isfile(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                name = json.load(f).get("input", "?")
+        count, used = inputs.get(name, (0, 0))
+        inputs[name] = (count + 1, used + size)
+    for name, (count, used) in sorted(inputs.items()):
+        logging.info("  %s: %d chunks, %.1f MB", name, count, used / 1e6)
+
+# Seconds without a write after which a .part chunk counts as abandoned
+PART_MAX_AGE = 3600
+
+def cache_prune(cache_dir, max_size_mb=None, max_age_days=None):
+    """Delete chunks older than max_age_days, then the least recently used until under max_size_mb."""
+    entries = cache_entries(cache_dir)
+    now = time.time()
+    keep = []
+    removed = 0
+    for entry in entries:
+        if max_age_days is not None and now - entry[2] > max_age_days * 86400:
+            _remove_chunk(entry[0])
+            removed += 1
+        else:
+            keep.append(entry)
+    total = sum(size for _, size, _ in keep)
+    while keep and max_size_mb is not None and total > max_size_mb * 1e6:
+        path, size, _ = keep.pop(0)
+        _remove_chunk(path)
+        total -= size
+        removed += 1
+    # Leftovers from interrupted renders; ffmpeg keeps touching the .part file
+    # of a chunk that is still being rendered, so only stale ones are removed
+    chunk_dir = os.path.join(cache_dir, "chunks")
+    if os.path.isdir(chunk_dir):
+        for name in os.listdir(chunk_dir):
+            path = os.path.join(chunk_dir, name)
+            if name.endswith(".part.mp4") and now - os.path.getmtime(path) > PART_MAX_AGE:
+                os.remove(path)
+    logging.info("Pruned %d chunks, %d left (%.1f MB)", removed, len(keep), total / 1e6)
+
+def _remove_chunk(path):
+    os.remove(path)
+    meta_path = path[:-len(".mp4")] + ".json"
+    if os.path.isfile(meta_path):
+        os.remove(meta_path)
+
+class TerminalScreen:
+    """Draws index grids to a terminal, one buffered write per frame.
+
+    Only rows that changed since the previous frame are rewritten unless
+    redraw is set or most of the screen changed.
+    """
+
+    def __init__(self, glyphs, stream=None, redraw=False):
+        self.stream = stream or sys.stdout.buffer
+        self.redraw = redraw
+        self.previous = None
+        try:
+            self.lut = np.frombuffer(glyphs.encode("ascii"), dtype=np.uint8)
+            self.wide = None
+        except UnicodeEncodeError:
+            self.lut = None
+            self.wide = np.array(list(glyphs))
+
+    def _rows(self, indices):
+        if self.lut is not None:
+            return [row.tobytes() for row in self.lut[indices]]
+        return ["".join(row).encode("utf-8") for row in self.wide[indices]]
+
+    def start(self):
+        # Hide cursor, clear screen
+        self.stream.write(b"\x1b[?25l\x1b[2J")
+        self.stream.flush()
+
+    def draw(self, indices):
+        changed = None
+        if self.previous is not None and not self.redraw and self.previous.shape == indices.shape:
+            changed = np.nonzero((indices != self.previous).any(axis=1))[0]
+            if len(changed) > indices.shape[0] // 2:
+                changed = None
+        if changed is None:
+            out = b"\x1b[H" + b"\r\n".join(self._rows(indices))
+        else:
+            rows = self._rows(indices[changed])
+            out = b"".join(b"\x1b[%d;1H" % (r + 1) + row for r, row in zip(changed, rows))
+        self.stream.write(out)
+        self.stream.flush()
+        self.previous = indices
+
+    def stop(self):
+        # Show cursor again, park it below the picture
+        rows = 0 if self.previous is None else self.previous.shape[0]
+        self.stream.write(b"\x1b[%d;1H\x1b[0m\x1b[?25h\n" % (rows + 1))
+        self.stream.flush()
+
+def play_terminal(cap, end_time, fps, settings=RenderSettings(), redraw=False):
+    """Play the video as ASCII in the terminal, dropping frames to hold the source FPS."""
+    screen = TerminalScreen(settings.glyphs, redraw=redraw)
+    frame_time = 1.0 / fps if fps > 0 else 1 / 25
+    shown = dropped = 0
+    index = 0
+    screen.start()
+    started = time.monotonic()
+    try:
+        while True:
+            # Skip ahead without converting frames when we are behind the clock
+            behind = int((time.monotonic() - started) / frame_time) - index
+            while behind > 0:
+                if cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 > end_time or not cap.grab():
+                    return shown, dropped
+                index += 1
+                dropped += 1
+                behind -= 1
+            if cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 > end_time:
+                break
+            ret, frame = cap.read()
+            if not ret:
+                break
+            indices, _ = to_grid(frame, settings)
+            screen.draw(indices)
+            shown += 1
+            index += 1
+            wait = started + index * frame_time - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        screen.stop()
+    return shown, dropped
+
+def write_stats(report, path):
+    text = json.dumps(report, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        logging.info("Stats written to %s", path)
+
+def open_video(input_video, start_time=0, end_time=None):
+    """Open and validate a video, seek to start_time.
+
+    Returns (cap, fps, end_time, frame_count), or None after logging why not.
+    """
+    # Verify video
+    cap = cv2.VideoCapture(input_video)
+    if not cap.isOpened():
+        logging.error("Cannot open video file %s", input_video)
+        return None
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    video_duration = total_frame_count / fps if fps > 0 else 0
+    logging.info("Video: %.2f FPS, Length: %.2f seconds", fps, video_duration)
+
+    end_time = end_time if end_time is not None else video_duration
+    if start_time < 0 or end_time > video_duration or start_time >= end_time:
+        logging.error("Incorrect times: start=%.2f, end=%.2f", start_time, end_time)
+        cap.release()
+        return None
+
+    # Set starting time
+    cap.set(cv2.CAP_PROP_POS_MSEC, start_time * 1000)
+    logging.info("Video starts: %.2f do %.2f seconds...", start_time, end_time)
+    return cap, fps, end_time, total_frame_count
+
+def render_stream(executor, frames, settings=RenderSettings(), window=8, workers=1, incremental=False,
+                  chunk_frames=24, tile=32, counts=None, stats=None):
+    """Render a frame stream on the pool, yielding output frames in order."""
+    if incremental:
+        # Each task is a run of consecutive frames so workers can diff them
+        render = partial(process_chunk, settings=settings, tile=tile)
+        if stats is not None:
+            render = partial(timed_call, render)
+        # Whole chunks still count against the window, so memory stays bounded by it
+        full_window = workers * chunk_frames
+        chunk_frames = max(1, min(chunk_frames, window))
+        chunk_window = max(1, window // chunk_frames)
+        if chunk_window < workers:
+            logging.info("Incremental: %d chunks of %d frames in flight keep %d of %d workers busy, "
+                         "--window %d would use all", chunk_window, chunk_frames, chunk_window, workers,
+                         full_window)
+        return apply_updates(bounded_map(executor, render, batched(frames, chunk_frames), chunk_window, stats),
+                             counts)
+    render = partial(process_frame, settings=settings)
+    if stats is not None:
+        render = partial(timed_call, render)
+    return bounded_map(executor, render, frames, window, stats)
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v")
+BATCH_SUFFIX = "_ascii"
+
+def load_batch(path, output_dir=None, start_time=0, end_time=None):
+    """Jobs from a JSON manifest or from every video in a directory.
+
+    A manifest is a list of {"input", "output", "start", "end"} objects;
+    only "input" is required and relative paths are relative to the manifest.
+    """
+    if os.path.isdir(path):
+        # Outputs of an earlier run land next to the inputs, leave them alone
+        items = [{"input": os.path.join(path, name)} for name in sorted(os.listdir(path))
+                 if name.lower().endswith(VIDEO_EXTENSIONS)
+                 and not os.path.splitext(name)[0].endswith(BATCH_SUFFIX)]
+        base = ""
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for item in items:
+        input_video = os.path.join(base, item["input"])
+        output = item.get("output")
+        if output is None:
+            stem = os.path.splitext(os.path.basename(input_video))[0]
+            output = os.path.join(output_dir or os.path.dirname(input_video), stem + BATCH_SUFFIX + ".mp4")
+        else:
+            output = os.path.join(output_dir or base, output)
+        jobs.append({"input": input_video, "output": output,
+                     "start": item.get("start", start_time), "end": item.get("end", end_time)})
+    # Never read a file that another job of this batch writes
+    outputs = {os.path.abspath(job["output"]) for job in jobs}
+    for job in jobs:
+        if os.path.abspath(job["input"]) in outputs:
+            logging.info("Skipping %s, it is an output of this batch", job["input"])
+    return [job for job in jobs if os.path.abspath(job["input"]) not in outputs]
+
+def run_job(executor, job, settings=RenderSettings(), encode=None, window=8, workers=1,
+            incremental=False, chunk_frames=24, tile=32):
+    # One batch item: stream its frames through the shared pool into its own ffmpeg
+    video = open_video(job["input"], job["start"], job["end"])
+    if video is None:
+        raise ValueError(f"cannot convert {job['input']}")
+    cap, fps, end_time, _ = video
+    name = os.path.basename(job["input"])
+    os.makedirs(os.path.dirname(os.path.abspath(job["output"])), exist_ok=True)
+    writer = FfmpegWriter(job["output"], fps, (settings.out_width, settings.out_height), job["input"],
+                          job["start"], end_time, **(encode or {}))
+    count = 0
+    try:
+        frames = prefetch(read_frames(cap, end_time), window)
+        for ascii_frame in render_stream(executor, frames, settings, window, workers, incremental,
+                                         chunk_frames, tile):
+            writer.write(ascii_frame)
+            count += 1
+            if count % 100 == 0:
+                logging.info(" [%s] %d frames ready", name, count)
+    finally:
+        cap.release()
+        # Waits for ffmpeg to finish muxing while the next job keeps the pool busy
+        writer.release()
+    logging.info(" [%s] done, %d frames saved as %s", name, count, job["output"])
+    return count
+
+def run_batch(jobs, workers, concurrent_jobs=2, settings=RenderSettings(), encode=None, window=8,
+              incremental=False, chunk_frames=24, tile=32):
+    """Convert many videos through one persistent worker pool.
+
+    Up to concurrent_jobs jobs feed the pool at once, so one job's final
+    encode and mux overlaps with the next job's rendering.
+    """
+    started = time.monotonic()
+    total = 0
+    failed = []
+    # Spawned (not forked) workers, so they never inherit the stdin pipe of
+    # an ffmpeg started by another job, which would keep it from ever seeing EOF
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor, \
+            ThreadPoolExecutor(max_workers=max(1, concurrent_jobs)) as job_pool:
+        futures = [job_pool.submit(run_job, executor, job, settings, encode, window, workers,
+                                   incremental, chunk_frames, tile) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                total += future.result()
+            except (ValueError, OSError, subprocess.CalledProcessError) as e:
+                logging.error("Batch item %s failed: %s", job["input"], e)
+                failed.append(job["input"])
+    elapsed = time.monotonic() - started
+    logging.info("Batch: %d/%d videos, %d frames in %.1f s (%.1f frames/s)",
+                 len(jobs) - len(failed), len(jobs), total, elapsed, total / elapsed if elapsed else 0)
+    return failed
+
 def main():
     parser = argparse.ArgumentParser(
         description="Video do ASCII art..."
@@ -89,65 +1264,205 @@ def main():
     parser.add_argument("--start", type=float, default=0, help="Start time (seconds)")
     parser.add_argument("--end", type=float, default=None, help="End time (seconds)")
     parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Paraller workers")
+    parser.add_argument("--renderer", choices=["atlas", "pil"], default="atlas",
+                        help="Glyph renderer (atlas = fast NumPy atlas, pil = original per-cell drawing)")
+    parser.add_argument("--cols", type=int, default=COLS, help="Characters per row")
+    parser.add_argument("--rows", type=int, default=ROWS, help="Character rows")
+    parser.add_argument("--width", type=int, default=OUT_WIDTH, help="Output width")
+    parser.add_argument("--height", type=int, default=OUT_HEIGHT, help="Output height")
+    parser.add_argument("--font", type=str, default=FONT_PATH, help="Font file")
+    parser.add_argument("--ramp", type=str, default="binary",
+                        help=f"Character ramp from dark to light: one of {', '.join(RAMPS)} or literal characters")
+    parser.add_argument("--dither", choices=["none", "ordered", "floyd"], default="none",
+                        help="Dithering between ramp levels")
+    parser.add_argument("--color", action="store_true",
+                        help="Draw each character in its cell's colour (renders up to 5x slower than monochrome, "
+                             "most with fonts whose glyphs spill into neighbouring cells, like the default one)")
+    parser.add_argument("--window", type=int, default=None,
+                        help="Max frames in flight while streaming, incremental chunks included (default: 2x workers)")
+    parser.add_argument("--preload", action="store_true",
+                        help="Decode the whole range into memory before rendering (old behaviour)")
+    parser.add_argument("--transport", choices=["pickle", "shared"], default="pickle",
+                        help="How frames reach the workers (shared = shared-memory ring buffers)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip unchanged frames and re-render only changed tiles")
+    parser.add_argument("--chunk-frames", type=int, default=24,
+                        help="Consecutive frames per worker task in incremental mode (at most --window)")
+    parser.add_argument("--tile", type=int, default=32, help="Dirty-tile size in cells for incremental mode")
+    parser.add_argument("--segments", type=int, default=0,
+                        help="Split the range into this many keyframe-aligned segments, each decoded, "
+                             "rendered and encoded by its own worker (0 = off)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Render in chunks stored in the cache dir; finished chunks are reused")
+    parser.add_argument("--cache-dir", type=str, default=os.path.join(os.path.expanduser("~"), ".cache", "ascii-video"),
+                        help="Chunk cache directory")
+    parser.add_argument("--chunk-seconds", type=float, default=10, help="Length of cached chunks")
+    parser.add_argument("--cache-info", action="store_true", help="Show cache contents and exit")
+    parser.add_argument("--cache-prune", action="store_true", help="Prune the cache and exit")
+    parser.add_argument("--max-cache-size", type=float, default=None, help="Prune down to this size (MB)")
+    parser.add_argument("--max-cache-age", type=float, default=None, help="Prune chunks unused for this many days")
+    parser.add_argument("--play", action="store_true",
+                        help="Play in the terminal instead of writing a file (size the grid with --cols/--rows)")
+    parser.add_argument("--play-redraw", action="store_true",
+                        help="Redraw the whole screen every frame instead of only changed rows")
+    parser.add_argument("--batch", type=str, default=None,
+                        help="JSON manifest or directory of videos to convert through one worker pool")
+    parser.add_argument("--batch-output-dir", type=str, default=None, help="Where batch outputs go")
+    parser.add_argument("--batch-jobs", type=int, default=2,
+                        help="Batch items feeding the pool at once (overlaps muxing with rendering)")
+    parser.add_argument("--stats", type=str, default=None,
+                        help="Write per-stage timings and queue depths of the streaming conversion "
+                             "as JSON to this file ('-' for stdout)")
+    parser.add_argument("--backend", choices=["ffmpeg", "opencv"], default="ffmpeg",
+                        help="Output backend (ffmpeg = single-pass pipe, opencv = temp file + re-encode)")
+    parser.add_argument("--encoder", type=str, default="libx264", help="ffmpeg video encoder")
+    parser.add_argument("--preset", type=str, default="slow", help="Encoder preset")
+    parser.add_argument("--crf", type=int, default=23, help="Encoder CRF")
+    parser.add_argument("--threads", type=int, default=0, help="Encoder threads (0 = auto)")
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     logging.info("Starting...")
 
-    # Verify video
-    cap = cv2.VideoCapture(args.input)
-    if not cap.isOpened():
-        logging.error("Cannot open video file %s", args.input)
+    if args.cache_info or args.cache_prune:
+        if args.cache_prune:
+            cache_prune(args.cache_dir, args.max_cache_size, args.max_cache_age)
+        cache_info(args.cache_dir)
         return
 
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-    video_duration = total_frame_count / fps if fps > 0 else 0
-    logging.info("Video: %.2f FPS, Length: %.2f seconds", fps, video_duration)
-    
-    end_time = args.end if args.end is not None else video_duration
-    if args.start < 0 or end_time > video_duration or args.start >= end_time:
-        logging.error("Incorrect times: start=%.2f, end=%.2f", args.start, end_time)
+    glyphs = RAMPS.get(args.ramp, args.ramp)
+    if len(glyphs) < 2:
+        logging.error("Character ramp needs at least two characters")
+        return
+    if args.cols < 1 or args.rows < 1 or args.cols > args.width or args.rows > args.height:
+        logging.error("Grid %dx%d does not fit in %dx%d output", args.cols, args.rows, args.width, args.height)
+        return
+    if args.stats and (args.segments or args.cache or args.batch or args.play):
+        logging.error("--stats covers the streaming conversion only, not --segments, --cache, --batch or --play")
         return
+    settings = RenderSettings(args.cols, args.rows, args.width, args.height, args.font,
+                              glyphs, args.dither, args.color, args.renderer)
 
-    # Set starting time
-    cap.set(cv2.CAP_PROP_POS_MSEC, args.start * 1000)
-    logging.info("Video starts: %.2f do %.2f seconds...", args.start, end_time)
+    encode = dict(encoder=args.encoder, preset=args.preset, crf=args.crf, threads=args.threads)
+    window = args.window or 2 * args.workers
+    if args.batch:
+        jobs = load_batch(args.batch, args.batch_output_dir, args.start, args.end)
+        logging.info("Batch of %d videos with %d workers...", len(jobs), args.workers)
+        run_batch(jobs, args.workers, args.batch_jobs, settings, encode, window,
+                  args.incremental, args.chunk_frames, args.tile)
+        return
 
-    frames = []
-    frame_indices = []
-    while True:
-        pos_sec = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
-        if pos_sec > end_time:
-            break
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
-    cap.release()
-    total_frames = len(frames)
-    logging.info("Loaded %d frames.", total_frames) 
-    
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    temp_video = "temp_video.mp4"
-    video_writer = cv2.VideoWriter(temp_video, fourcc, fps, (OUT_WIDTH, OUT_HEIGHT))
+    video = open_video(args.input, args.start, args.end)
+    if video is None:
+        return
+    cap, fps, end_time, total_frame_count = video
+
+    if args.play:
+        if args.color:
+            logging.info("Colour is not supported in terminal playback, playing monochrome")
+        shown, dropped = play_terminal(cap, end_time, fps, settings, args.play_redraw)
+        cap.release()
+        logging.info("Played %d frames, dropped %d to keep up", shown, dropped)
+        return
+
+    # Expected frame count, only used for progress
+    total_frames = max(1, int(round((end_time - args.start) * fps)))
+
+    if args.segments or args.cache:
+        cap.release()
+        # Same frames the streaming reader takes: it checks the time of the last
+        # decoded frame, so it also reads the first frame past end_time
+        first_frame = first_frame_at(args.start, fps)
+        frame_count = min(int(end_time * fps + 1e-6) + 2, int(total_frame_count)) - first_frame
+        extra = (settings, encode, args.incremental, args.chunk_frames, args.tile)
+        try:
+            if args.cache:
+                convert_cached(args.input, args.start, end_time, fps, frame_count, args.output,
+                               args.workers, args.cache_dir, args.chunk_seconds, *extra)
+            else:
+                convert_segmented(args.input, args.start, end_time, fps, frame_count, args.output,
+                                  args.workers, args.segments, *extra)
+        except subprocess.CalledProcessError as e:
+            logging.error("FFMPEG ERROR: %s", e)
+            return
+        logging.info("DONE! Saved as %s", args.output)
+        return
+
+    if args.incremental and args.transport == "shared":
+        logging.error("--incremental works with the pickle transport only")
+        return
+    stats = StageStats() if args.stats else None
+    if args.transport == "shared":
+        frame_shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    elif args.preload:
+        frames = list(read_frames(cap, end_time, stats))
+        cap.release()
+        total_frames = len(frames)
+        logging.info("Loaded %d frames.", total_frames)
+    else:
+        # Decode in a background thread, at most `window` frames ahead
+        frames = prefetch(read_frames(cap, end_time, stats), window, stats)
+
+    final_output = args.output
+    if args.backend == "ffmpeg":
+        video_writer = FfmpegWriter(final_output, fps, (args.width, args.height), args.input,
+                                    args.start, end_time, **encode)
+    else:
+        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+        temp_video = "temp_video.mp4"
+        video_writer = cv2.VideoWriter(temp_video, fourcc, fps, (args.width, args.height))
 
     # Paraller calculations
-    logging.info("Parraler computation with %d workers...", args.workers)
+    logging.info("Parraler computation with %d workers (window %d, %s transport)...",
+                 args.workers, window, args.transport)
     processed_count = 0
-    with ProcessPoolExecutor(max_workers=args.workers) as executor:
-        for processed_frame in executor.map(process_frame, frames):
-            processed_count += 1
-            if processed_count % 10 == 0 or processed_count == total_frames:
-                logging.info(" %d/%d frames ready", processed_count, total_frames)
-            video_writer.write(processed_frame)
-    video_writer.release()
+    update_counts = {}
+    try:
+        with ExitStack() as stack:
+            if args.transport == "shared":
+                results = render_shared(cap, end_time, frame_shape, args.workers, window, settings, stats)
+                stack.callback(results.close)
+            else:
+                executor = stack.enter_context(ProcessPoolExecutor(max_workers=args.workers))
+                results = render_stream(executor, frames, settings, window, args.workers, args.incremental,
+                                        args.chunk_frames, args.tile, update_counts, stats)
+            for processed_frame in results:
+                processed_count += 1
+                if processed_count % 10 == 0:
+                    logging.info(" %d/~%d frames ready", processed_count, total_frames)
+                encoding = time.perf_counter()
+                video_writer.write(processed_frame)
+                if stats is not None:
+                    stats.add("encode", time.perf_counter() - encoding)
+    except subprocess.CalledProcessError as e:
+        cap.release()
+        logging.error("FFMPEG ERROR: %s", e)
+        return
+    cap.release()
+    logging.info(" %d frames ready", processed_count)
+    if update_counts:
+        logging.info("Incremental: %d full, %d patched, %d reused frames", update_counts.get("frame", 0),
+                     update_counts.get("patch", 0), update_counts.get("same", 0))
+    try:
+        encoding = time.perf_counter()
+        video_writer.release()
+        if stats is not None:
+            stats.add("encode_flush", time.perf_counter() - encoding)
+    except subprocess.CalledProcessError as e:
+        logging.error("FFMPEG ERROR: %s", e)
+        return
+    if stats is not None:
+        write_stats(stats.report(processed_count, workers=args.workers, window=window, transport=args.transport,
+                                 incremental=args.incremental, backend=args.backend,
+                                 settings=settings._asdict()), args.stats)
+    if args.backend == "ffmpeg":
+        logging.info("DONE! Saved as %s", final_output)
+        return
     logging.info("Video without audio saved as %s", temp_video)
 
     # Merge video and audio
-    final_output = args.output
     try:
-        extract_and_merge_audio(args.input, args.start, end_time, temp_video, final_output)
+        extract_and_merge_audio(args.input, args.start, end_time, temp_video, final_output, **encode)
     except subprocess.CalledProcessError as e:
         logging.error("FFMPEG ERROR: %s", e)
         return